@@ -0,0 +1,110 @@
+import collections
+
+from .frozen import freeze
+
+
+EffectStep = collections.namedtuple('EffectStep', ['type', 'target', 'parameters'])
+
+TARGETS = ('self', 'other')
+
+# Parameters of each basic effect type: name -> default (REQUIRED if none)
+REQUIRED = object()
+EFFECT_PARAMETERS = {
+    'change_stat': {
+        'stat': REQUIRED,
+        'strength_factor': 1,
+        'show_result': True,
+    },
+    'play_animation': {
+        'animation_name': (),
+    },
+    'play_vfx': {
+        'vfx': (),
+        'duration': 1.0,
+    },
+    'move_to_range': {
+        'range': REQUIRED,
+        'is_hit_dependent': False,
+    },
+    'move_to_start': {},
+}
+
+
+class EffectPlan(tuple):
+    """The basic effect steps of an ability with templates expanded
+
+    Plans are compiled once per ability (see compile_ability) and are never
+    modified afterwards.
+    """
+    __slots__ = ()
+
+
+def _make_step(ability, etype, target, parameters):
+    if etype not in EFFECT_PARAMETERS:
+        raise RuntimeError(f'Unknown effect type: {etype}')
+    if target not in TARGETS:
+        raise RuntimeError(f'Unknown effect target: {target}')
+
+    resolved = {}
+    for name, default in EFFECT_PARAMETERS[etype].items():
+        if name in parameters:
+            resolved[name] = parameters[name]
+        elif default is REQUIRED:
+            raise RuntimeError(f'{etype} effect is missing parameter: {name}')
+        else:
+            resolved[name] = default
+
+    if etype == 'play_animation':
+        # Prefer an ability specific animation and fall back to attack
+        anims = resolved.pop('animation_name')
+        if isinstance(anims, str):
+            anims = [anims]
+        resolved['animations'] = (ability.id, *anims, 'attack')
+    elif etype == 'play_vfx' and isinstance(resolved['vfx'], str):
+        resolved['vfx'] = [resolved['vfx']]
+
+    return EffectStep(etype, target, freeze(resolved))
+
+
+def _template_simple(ability, target, parameters):
+    parameters = dict(parameters)
+    parameters.setdefault('stat', 'current_hp')
+    if 'animation_name' not in parameters and ability.type == 'magical':
+        parameters['animation_name'] = 'magic'
+    if 'vfx' not in parameters:
+        parameters['vfx'] = ['dust'] if ability.type == 'magical' else ['sparks']
+
+    steps = []
+    if 'start_range' in parameters:
+        approach = dict(parameters, range=parameters['start_range'])
+        steps.append(_make_step(ability, 'move_to_range', 'self', approach))
+    steps += [
+        _make_step(ability, 'play_animation', 'self', parameters),
+        _make_step(ability, 'play_vfx', target, parameters),
+        _make_step(ability, 'change_stat', target, parameters),
+    ]
+    if 'start_range' in parameters:
+        # end_range has never been applied, the golem returns to start_range
+        steps.append(steps[0])
+    return steps
+
+
+TEMPLATES = {
+    'template_simple': _template_simple,
+}
+
+
+def compile_ability(ability):
+    """Compile the effects of an ability into an EffectPlan"""
+    steps = []
+    for effect in ability.effects:
+        etype = effect['type']
+        target = effect.get('target', 'other')
+        parameters = effect.get('parameters', {})
+        if etype in TEMPLATES:
+            if target not in TARGETS:
+                raise RuntimeError(f'Unknown effect target: {target}')
+            steps += TEMPLATES[etype](ability, target, parameters)
+        else:
+            steps.append(_make_step(ability, etype, target, parameters))
+    return EffectPlan(steps)
@@ -0,0 +1,72 @@
+import collections
+
+import panda3d.core as p3d
+
+from . import gamedb
+from .monster import MonsterActor
+
+
+class ActorPool:
+    """Reuses MonsterActors keyed by (form, weapon)
+
+    Released actors are parked off-scene instead of being destroyed. An
+    idle actor with the right form but a different weapon has its weapon
+    swapped in place rather than building a new actor. Requests without
+    a weapon only reuse unarmed actors. Parked actors drop animations they
+    have not played recently.
+    """
+    def __init__(self, parent_node, actor_factory=MonsterActor):
+        self.parent_node = parent_node
+        self.actor_factory = actor_factory
+        self.parking_node = p3d.NodePath('parked actors')
+        self.active = []
+        self._idle = collections.defaultdict(list)
+
+    def _take_idle(self, form_id, weapon_id):
+        actors = self._idle.get((form_id, weapon_id))
+        if actors:
+            return actors.pop()
+        if weapon_id is None:
+            # Actors cannot be disarmed, so an unarmed request needs an
+            # unarmed actor
+            return None
+        for (idle_form, _), actors in self._idle.items():
+            if idle_form == form_id and actors:
+                return actors.pop()
+        return None
+
+    def acquire(self, form, weapon=None):
+        if isinstance(weapon, str):
+            weapon = gamedb.get_instance()['weapons'][weapon]
+        weapon_id = weapon.id if weapon else None
+
+        actor = self._take_idle(form.id, weapon_id)
+        if actor is None:
+            actor = self.actor_factory(form, self.parent_node, weapon)
+        else:
+            if weapon and actor.weapon_id != weapon_id:
+                actor.update_weapon(weapon)
+            actor.reparent_to(self.parent_node)
+            actor.play_anim('idle', loop=True)
+        self.active.append(actor)
+        return actor
+
+    def release(self, actor):
+        self.active.remove(actor)
+        actor.stop()
+        actor.unload_unused_anims()
+        actor.reparent_to(self.parking_node)
+        self._idle[(actor.form.id, actor.weapon_id)].append(actor)
+
+    def release_all(self):
+        for actor in list(self.active):
+            self.release(actor)
+
+    def cleanup(self):
+        self.release_all()
+        for actors in self._idle.values():
+            for actor in actors:
+                actor.cleanup()
+                actor.remove_node()
+        self._idle.clear()
+        self.parking_node.remove_node()
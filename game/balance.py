@@ -0,0 +1,158 @@
+"""Expected combat outcomes for whole rosters of golems
+
+Everything here follows the rules in combatresolver (re-exported by effects):
+abilities roll hit and crit against randrange(0, 99), crits deal
+round(strength * 1.5) and every golem gains CT at the same rate, so each one
+acts exactly once per CT cycle.
+"""
+import numpy as np
+
+from . import combatresolver
+from . import gamedb
+from .rostertable import RosterTable
+
+
+# Rolls are randrange(0, 99) and succeed if the chance is greater than the roll
+ROLL_OUTCOMES = 99
+
+# Fractional damage adds up to slightly different totals depending on the
+# order of hits, so anything this close to 0 HP counts as dead
+HP_EPSILON = 1e-9
+
+
+def roll_probability(chance):
+    return np.clip(chance, 0, ROLL_OUTCOMES) / ROLL_OUTCOMES
+
+
+def loadouts(gdb=None, learn_all=True):
+    """Every form with every weapon it can use, as RosterTable entries
+
+    Rows either learn all of their form and weapon abilities (learn_all) or
+    none of them.
+    """
+    if gdb is None:
+        gdb = gamedb.get_instance()
+    entries = []
+    for form in gdb.sorted_values('forms'):
+        form_mask = gdb.tag_mask(set(form.tags) | {f'form_{form.id}'})
+        for weapon in gdb.sorted_values('weapons'):
+            if weapon.required_tag_mask & ~form_mask:
+                continue
+            abilities = tuple(weapon.abilities) + tuple(form.abilities) if learn_all else ()
+            entries.append((form, weapon, abilities))
+    return entries
+
+
+class AbilityOdds:
+    """Per-ability hit and crit probabilities and damage dealt to the target"""
+    def __init__(self, gdb, ability_ids):
+        abilities = [gdb['abilities'][i] for i in ability_ids]
+        # Hit and crit chances only depend on the ability
+        self.hit = roll_probability(np.array([
+            combatresolver.calculate_hit_chance(None, None, i)
+            for i in abilities
+        ]))
+        self.crit = roll_probability(np.array([
+            combatresolver.calculate_crit_chance(None, None, i)
+            for i in abilities
+        ]))
+        # Sum of strength factors of the current_hp changes to the target
+        self.damage_factor = np.array([
+            sum(
+                step.parameters['strength_factor']
+                for step in gdb.compiled('abilities', i.id)
+                if step.type == 'change_stat'
+                and step.target == 'other'
+                and step.parameters['stat'] == 'current_hp'
+            )
+            for i in abilities
+        ], dtype=np.float64)
+        self.has_effects = np.array([bool(i.effects) for i in abilities])
+
+
+class DamageTable:
+    """Expected damage and turns-to-kill of every attacker against every defender
+
+    attackers and defenders are RosterTables (or RosterTable entries);
+    defenders default to the attackers. Attackers always use the usable
+    ability with the highest expected damage.
+    """
+    def __init__(self, attackers, defenders=None, gdb=None):
+        if gdb is None:
+            gdb = gamedb.get_instance()
+        if not isinstance(attackers, RosterTable):
+            attackers = RosterTable(attackers, gdb)
+        if defenders is None:
+            defenders = attackers
+        elif not isinstance(defenders, RosterTable):
+            defenders = RosterTable(defenders, gdb)
+        self.attackers = attackers
+        self.defenders = defenders
+        self.ability_ids = attackers.abilities.ids
+        self.odds = AbilityOdds(gdb, self.ability_ids)
+
+        # Combatants can always use basic_attack on top of their abilities
+        # that have effects
+        self.usable = (attackers.learned > 0) & self.odds.has_effects
+        self.usable[:, attackers.abilities.index['basic_attack']] = True
+
+        strength = attackers.strength
+        self.hit_damage = strength * self.odds.damage_factor
+        # Only the crit strength is rounded, strength factors are applied as is
+        self.crit_damage = np.round(strength * 1.5) * self.odds.damage_factor
+        self.expected_damage = self.odds.hit * (
+            (1 - self.odds.crit) * self.hit_damage
+            + self.odds.crit * self.crit_damage
+        )
+
+        usable_damage = np.where(self.usable, self.expected_damage, -np.inf)
+        self.best_ability = usable_damage.argmax(axis=1)
+        rows = np.arange(len(attackers))
+        # Every golem acts once per CT cycle
+        self.dps = self.expected_damage[rows, self.best_ability]
+
+        self.turns_to_kill = self._turns_to_kill()
+
+    def _turns_to_kill(self):
+        """Expected number of turns for each attacker to bring each defender to 0 HP"""
+        hit_points = self.defenders.stat('hp')
+        rows = np.arange(len(self.attackers))
+        best = self.best_ability
+        p_hit = self.odds.hit[best]
+        p_crit = self.odds.crit[best]
+        hit_damage = self.hit_damage[rows, best]
+        crit_damage = self.crit_damage[rows, best]
+        min_damage = np.minimum(hit_damage, crit_damage)
+        can_kill = (min_damage > 0) & (p_hit > 0)
+
+        # Every hit that lands takes 1 / p_hit turns on average, so
+        # turns = E[landed hits needed to deal hp damage] / p_hit.
+        # Damage can be fractional, so count the landed hits directly: after
+        # n landed hits with k crits the damage is n * hit + k * (crit - hit)
+        # and k is binomially distributed (crit_odds). Summing P(damage < hp) over n
+        # gives the expected number of landed hits.
+        max_hp = max(float(hit_points.max(initial=0)), 0)
+        max_landed = 0
+        if can_kill.any():
+            max_landed = int(np.ceil(max_hp / min_damage[can_kill].min())) + 1
+        landed = np.zeros((len(rows), len(hit_points)))
+        crit_odds = np.ones((len(rows), 1))
+        for num_landed in range(max_landed):
+            damage = (
+                num_landed * hit_damage[:, None]
+                + np.arange(num_landed + 1) * (crit_damage - hit_damage)[:, None]
+            )
+            alive = damage[:, None, :] < hit_points[None, :, None] - HP_EPSILON
+            landed += (crit_odds[:, None, :] * alive).sum(axis=2)
+            crit_odds = (
+                np.pad(crit_odds * (1 - p_crit)[:, None], ((0, 0), (0, 1)))
+                + np.pad(crit_odds * p_crit[:, None], ((0, 0), (1, 0)))
+            )
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            turns = np.where(can_kill[:, None], landed / p_hit[:, None], np.inf)
+        turns[:, hit_points <= 0] = 0
+        return turns
+
+    def ability_damage(self, ability_id):
+        return self.expected_damage[:, self.attackers.abilities.index[ability_id]]
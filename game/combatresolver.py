@@ -0,0 +1,224 @@
+"""Combat rules that run without a scene graph
+
+resolve_ability() rolls an ability use and returns the outcome as a list of
+events. Presentation (see effects.SequenceBuilder) turns the events into
+intervals, while simulations can apply them directly with apply_event().
+"""
+import collections
+import math
+import random
+
+from . import gamedb
+
+
+AbilityUsed = collections.namedtuple(
+    'AbilityUsed',
+    ['combatant', 'target', 'ability', 'is_hit', 'is_crit', 'strength']
+)
+# delta is 0 and is_hit is False for a miss
+StatChange = collections.namedtuple(
+    'StatChange',
+    ['combatant', 'stat', 'delta', 'is_hit', 'is_crit', 'show_result']
+)
+Move = collections.namedtuple('Move', ['combatant', 'from_tile', 'to_tile'])
+# A combatant moved by someone else's ability
+Knockback = collections.namedtuple('Knockback', ['combatant', 'from_tile', 'to_tile'])
+PlayAnimation = collections.namedtuple('PlayAnimation', ['combatant', 'animations'])
+PlayVfx = collections.namedtuple('PlayVfx', ['combatant', 'vfx', 'duration'])
+
+
+def calculate_hit_chance(_combatant, _target, ability):
+    return ability.hit_chance
+
+
+def calculate_crit_chance(_combatant, _target, _ability):
+    return 5
+
+
+def calculate_strength(combatant, ability):
+    if ability.type == 'magical':
+        attack_stat = combatant.magical_attack
+    elif ability.type == 'physical':
+        attack_stat = combatant.physical_attack
+    else:
+        attack_stat = 1
+
+    if ability.power == 'weapon':
+        ability_power = combatant.weapon.damage
+    else:
+        ability_power = ability.power
+
+    return 1 + attack_stat + ability_power
+
+
+def tile_distance(tilea, tileb):
+    return abs(tilea[0] - tileb[0]) + abs(tilea[1] - tileb[1])
+
+
+def tile_get_facing_to(from_tile, to_tile):
+    dirx = to_tile[0] - from_tile[0]
+    diry = to_tile[1] - from_tile[1]
+    length = math.hypot(dirx, diry)
+    if length:
+        dirx /= length
+        diry /= length
+
+    facing = [round(dirx), round(diry)]
+
+    # Special cases
+    if abs(facing[0]) == 1 and abs(facing[1]) == 1:
+        facing[1] = 0
+
+    return tuple(facing)
+
+
+class ArenaState:
+    """Size of the arena and the tile of every living combatant"""
+    def __init__(self, sizex, sizey, positions=None):
+        self.sizex = sizex
+        self.sizey = sizey
+        self.positions = dict(positions) if positions else {}
+
+    @classmethod
+    def from_combatants(cls, sizex, sizey, combatants):
+        return cls(sizex, sizey, {i: i.tile_position for i in combatants})
+
+    def copy(self):
+        return ArenaState(self.sizex, self.sizey, self.positions)
+
+    def tile_coord_in_bounds(self, tile_pos):
+        return bool(self.sizex > tile_pos[0] >= 0 and self.sizey > tile_pos[1] >= 0)
+
+    def combatant_in_tile(self, tile_pos):
+        for combatant, position in self.positions.items():
+            if position == tile_pos:
+                return combatant
+        return None
+
+    def position(self, combatant):
+        if combatant not in self.positions:
+            self.positions[combatant] = combatant.tile_position
+        return self.positions[combatant]
+
+    def find_tile_at_range(self, combatant, other, target_range):
+        start = self.position(combatant)
+        other_pos = self.position(other)
+        distance = tile_distance(start, other_pos)
+
+        inc = 1 if target_range < distance else -1
+
+        direction = tile_get_facing_to(start, other_pos)
+        for target in range(target_range, distance, inc):
+            pos = (
+                other_pos[0] - direction[0] * target,
+                other_pos[1] - direction[1] * target,
+            )
+            if self.tile_coord_in_bounds(pos) and not self.combatant_in_tile(pos):
+                return pos
+
+        return start
+
+
+class _Resolver:
+    def __init__(self, combatant, target, ability, arena_state, rng):
+        self.targets = {
+            'self': combatant,
+            'other': target,
+        }
+        self.arena_state = arena_state
+        self.initial_positions = {
+            key: arena_state.position(value)
+            for key, value in self.targets.items()
+        }
+
+        hit_chance = calculate_hit_chance(combatant, target, ability)
+        self.is_hit = hit_chance > rng.randrange(0, 99)
+        crit_chance = calculate_crit_chance(combatant, target, ability)
+        self.is_crit = crit_chance > rng.randrange(0, 99)
+        self.strength = calculate_strength(combatant, ability)
+        if self.is_crit:
+            self.strength = round(self.strength * 1.5)
+
+        self.events = [
+            AbilityUsed(combatant, target, ability, self.is_hit, self.is_crit, self.strength)
+        ]
+
+    def change_stat(self, step):
+        strength = self.strength * step.parameters['strength_factor']
+        self.events.append(StatChange(
+            self.targets[step.target],
+            step.parameters['stat'],
+            -strength if self.is_hit else 0,
+            self.is_hit,
+            self.is_crit,
+            step.parameters['show_result'],
+        ))
+
+    def play_animation(self, step):
+        self.events.append(PlayAnimation(
+            self.targets[step.target],
+            step.parameters['animations']
+        ))
+
+    def play_vfx(self, step):
+        self.events.append(PlayVfx(
+            self.targets[step.target],
+            step.parameters['vfx'],
+            step.parameters['duration']
+        ))
+
+    def _move(self, step, tile_pos):
+        combatant = self.targets[step.target]
+        event_type = Move if step.target == 'self' else Knockback
+        self.events.append(event_type(combatant, self.arena_state.position(combatant), tile_pos))
+        self.arena_state.positions[combatant] = tile_pos
+
+    def move_to_range(self, step):
+        if step.parameters['is_hit_dependent'] and not self.is_hit:
+            return
+
+        other = self.targets['other' if step.target == 'self' else 'self']
+        self._move(step, self.arena_state.find_tile_at_range(
+            self.targets[step.target],
+            other,
+            step.parameters['range']
+        ))
+
+    def move_to_start(self, step):
+        self._move(step, self.initial_positions[step.target])
+
+    HANDLERS = {
+        'change_stat': change_stat,
+        'play_animation': play_animation,
+        'play_vfx': play_vfx,
+        'move_to_range': move_to_range,
+        'move_to_start': move_to_start,
+    }
+
+
+def resolve_ability(combatant, target, ability, arena_state, rng=random, gdb=None):
+    """Roll combatant using ability on target and return the outcome events
+
+    Neither the combatants nor arena_state are modified.
+    """
+    if gdb is None:
+        gdb = gamedb.get_instance()
+    resolver = _Resolver(combatant, target, ability, arena_state.copy(), rng)
+    for step in gdb.compiled('abilities', ability.id):
+        resolver.HANDLERS[step.type](resolver, step)
+    return resolver.events
+
+
+def apply_event(event, arena_state=None):
+    """Apply the game state changes of an event to the combatants (and arena_state)"""
+    if isinstance(event, StatChange):
+        if event.is_hit:
+            setattr(
+                event.combatant,
+                event.stat,
+                getattr(event.combatant, event.stat) + event.delta
+            )
+    elif isinstance(event, (Move, Knockback)):
+        event.combatant.tile_position = event.to_tile
+        if arena_state is not None:
+            arena_state.positions[event.combatant] = event.to_tile
@@ -0,0 +1,58 @@
+def _counted(name, base):
+    method = getattr(base, name)
+    def wrapper(self, *args, **kwargs):
+        retval = method(self, *args, **kwargs)
+        self._modified() # pylint: disable=protected-access
+        return retval
+    wrapper.__name__ = name
+    return wrapper
+
+
+class CountedList(list):
+    """A list that counts modifications so derived values can be cached"""
+    __slots__ = ('version',)
+
+    def __init__(self, iterable=()):
+        super().__init__(iterable)
+        self.version = 0
+
+    def _modified(self):
+        self.version += 1
+
+    def __reduce__(self):
+        return (self.__class__, (list(self),), self.version)
+
+    def __setstate__(self, version):
+        self.version = version
+
+
+class CountedSet(set):
+    """A set that counts modifications so derived values can be cached"""
+    __slots__ = ('version',)
+
+    def __init__(self, iterable=()):
+        super().__init__(iterable)
+        self.version = 0
+
+    def _modified(self):
+        self.version += 1
+
+    def __reduce__(self):
+        return (self.__class__, (set(self),), self.version)
+
+    def __setstate__(self, version):
+        self.version = version
+
+
+for _name in [
+        'append', 'clear', 'extend', 'insert', 'pop', 'remove', 'reverse', 'sort',
+        '__delitem__', '__iadd__', '__imul__', '__setitem__',
+]:
+    setattr(CountedList, _name, _counted(_name, list))
+
+for _name in [
+        'add', 'clear', 'difference_update', 'discard', 'intersection_update',
+        'pop', 'remove', 'symmetric_difference_update', 'update',
+        '__iand__', '__ior__', '__isub__', '__ixor__',
+]:
+    setattr(CountedSet, _name, _counted(_name, set))
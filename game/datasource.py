@@ -0,0 +1,161 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+
+
+BUNDLE_MAGIC = b'MERCDATA'
+BUNDLE_VERSION = 1
+# magic, version, header length
+BUNDLE_PREFIX = struct.Struct('<8sIQ')
+SCHEMA_SUFFIX = '.schema.json'
+
+
+def hash_category(schema_data, files):
+    hasher = hashlib.sha256(schema_data)
+    for filename, data in files:
+        hasher.update(f'\n{filename}\n{len(data)}\n'.encode('utf8'))
+        hasher.update(data)
+    return hasher.hexdigest()
+
+
+class DataDirectory:
+    def __init__(self, data_dir, schema_dir=None):
+        self.data_dir = data_dir
+        self.schema_dir = schema_dir or os.path.join(data_dir, 'schemas')
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.data_dir!r})'
+
+    def schema_keys(self):
+        return sorted(
+            i.replace(SCHEMA_SUFFIX, '')
+            for i in os.listdir(self.schema_dir)
+            if i.endswith(SCHEMA_SUFFIX)
+        )
+
+    def has_category(self, key):
+        return os.path.exists(os.path.join(self.data_dir, key))
+
+    def read_schema(self, key):
+        with open(os.path.join(self.schema_dir, f'{key}{SCHEMA_SUFFIX}'), 'rb') as schemafile:
+            return schemafile.read()
+
+    def filenames(self, key):
+        return sorted(os.listdir(os.path.join(self.data_dir, key)))
+
+    def read(self, key, filename):
+        with open(os.path.join(self.data_dir, key, filename), 'rb') as datafile:
+            return datafile.read()
+
+    def content_hash(self, key):
+        return hash_category(
+            self.read_schema(key),
+            ((i, self.read(key, i)) for i in self.filenames(key))
+        )
+
+    def scan(self, key):
+        with os.scandir(os.path.join(self.data_dir, key)) as entries:
+            return {
+                entry.name: (entry.stat().st_mtime_ns, entry.stat().st_size)
+                for entry in entries
+            }
+
+
+class DataBundle:
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as bundlefile:
+            self._data = mmap.mmap(bundlefile.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, header_len = BUNDLE_PREFIX.unpack_from(self._data)
+        if magic != BUNDLE_MAGIC or version != BUNDLE_VERSION:
+            self._data.close()
+            raise RuntimeError(f'{path} is not a version {BUNDLE_VERSION} data bundle')
+        header_end = BUNDLE_PREFIX.size + header_len
+        self._header = json.loads(self._data[BUNDLE_PREFIX.size:header_end])
+        self._payload_start = header_end
+        self._files = {
+            key: {
+                filename: (offset, length)
+                for filename, offset, length in category['files']
+            }
+            for key, category in self._header['categories'].items()
+        }
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.path!r})'
+
+    def __getstate__(self):
+        return self.path
+
+    def __setstate__(self, state):
+        self.__init__(state)
+
+    def close(self):
+        self._data.close()
+
+    def _slice(self, offset, length):
+        start = self._payload_start + offset
+        return self._data[start:start + length]
+
+    def schema_keys(self):
+        return sorted(self._header['schemas'])
+
+    def has_category(self, key):
+        return key in self._header['categories']
+
+    def read_schema(self, key):
+        return self._slice(*self._header['schemas'][key])
+
+    def filenames(self, key):
+        return list(self._files[key])
+
+    def read(self, key, filename):
+        return self._slice(*self._files[key][filename])
+
+    def content_hash(self, key):
+        return self._header['categories'][key]['hash']
+
+    def scan(self, _key):
+        # Bundles are immutable, so there is never anything to hot-reload
+        return {}
+
+
+def write_bundle(source, path):
+    header = {
+        'schemas': {},
+        'categories': {},
+    }
+    payload = []
+    offset = 0
+
+    def add_payload(data):
+        nonlocal offset
+        payload.append(data)
+        location = (offset, len(data))
+        offset += len(data)
+        return location
+
+    for key in source.schema_keys():
+        header['schemas'][key] = add_payload(source.read_schema(key))
+        if not source.has_category(key):
+            continue
+        header['categories'][key] = {
+            'hash': source.content_hash(key),
+            'files': [
+                (filename, *add_payload(source.read(key, filename)))
+                for filename in source.filenames(key)
+            ]
+        }
+
+    header_data = json.dumps(header, sort_keys=True).encode('utf8')
+    tmppath = f'{path}.{os.getpid()}.tmp'
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(tmppath, 'wb') as bundlefile:
+        bundlefile.write(BUNDLE_PREFIX.pack(BUNDLE_MAGIC, BUNDLE_VERSION, len(header_data)))
+        bundlefile.write(header_data)
+        for data in payload:
+            bundlefile.write(data)
+    os.replace(tmppath, path)
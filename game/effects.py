@@ -1,46 +1,16 @@
-import random
-
 import panda3d.core as p3d
 from direct.interval import IntervalGlobal as intervals
-from direct.particles.ParticleEffect import ParticleEffect
-
-import pman
-
-
-def calculate_hit_chance(_combatant, _target, ability):
-    return ability.hit_chance
-
 
-def calculate_crit_chance(_combatant, _target, _ability):
-    return 5
+from . import combatresolver
+from . import floatingtext
+from . import vfxpool
 
+# The combat rules live in combatresolver, these are kept for existing users
+# pylint: disable=unused-import
+from .combatresolver import calculate_hit_chance, calculate_crit_chance, calculate_strength
 
-def calculate_strength(combatant, ability):
-    if ability.type == 'magical':
-        attack_stat = combatant.magical_attack
-    elif ability.type == 'physical':
-        attack_stat = combatant.physical_attack
-    else:
-        attack_stat = 1
-
-    if ability.power == 'weapon':
-        ability_power = combatant.weapon.damage
-    else:
-        ability_power = ability.power
-
-    return 1 + attack_stat + ability_power
 
 class SequenceBuilder:
-    ALLOWED_EFFECTS = [
-        'change_stat',
-        'play_animation',
-        'play_vfx',
-        'move_to_range',
-        'move_to_start',
-
-        'template_simple',
-    ]
-
     CHANGE_STATE_PREFIX = {
         'current_hp': 'HP: ',
         'physical_attack': 'PA: ',
@@ -54,194 +24,87 @@ class SequenceBuilder:
         self.ability = ability
         self.combat = combat
 
-        hit_chance = calculate_hit_chance(combatant, combatant.target, ability)
-        roll = random.randrange(0, 99)
-        self.is_hit = hit_chance > roll
-        #print(hit, hit_chance, die)
-        crit_chance = calculate_crit_chance(combatant, combatant.target, ability)
-        roll = random.randrange(0, 99)
-        self.is_crit = crit_chance > roll
-        self.strength = calculate_strength(combatant, ability)
-        if self.is_crit:
-            self.strength = round(self.strength * 1.5)
+        self.events = combatresolver.resolve_ability(
+            combatant,
+            combatant.target,
+            ability,
+            combat.arena_state()
+        )
+        rolled = self.events[0]
+        self.is_hit = rolled.is_hit
+        self.is_crit = rolled.is_crit
+        self.strength = rolled.strength
 
         self.sequence = intervals.Sequence()
-
-        self.initial_self_position = combatant.tile_position
-        self.initial_other_position = combatant.target.tile_position
-        self.initial_position = None
-
-        for effect in ability.effects:
-            self.sequence.extend(self.parse_effect(effect))
+        for event in self.events:
+            self.sequence.append(self.HANDLERS[type(event)](self, event))
         self.sequence.append(
             intervals.Func(combatant.play_anim, 'idle', loop=True),
         )
 
-    def parse_effect(self, effect):
-        sequence = intervals.Sequence()
-        target = effect.get('target', 'other')
-        if target == 'self':
-            target = self.combatant
-            self.initial_position = self.initial_self_position
-        elif target == 'other':
-            target = self.combatant.target
-            self.initial_position = self.initial_other_position
-        else:
-            raise RuntimeError("Unkown effect target: {}".format(target))
-
-        parameters = effect.get('parameters', {})
-        etype = effect['type']
-
-        if etype not in self.ALLOWED_EFFECTS:
-            raise RuntimeError("Unknown effect type: {}".format(etype))
-
-        sequence.append(getattr(self, etype)(target, parameters))
-
-        return sequence
-
     def as_sequence(self):
         return self.sequence
 
     def show_result(self, target, value):
-        textnode = p3d.TextNode('effect result')
-        textnode.set_align(p3d.TextNode.ACenter)
-        textnode.set_text(value)
-
-        textnp = self.rendernp.attach_new_node(textnode)
-        textnp.set_billboard_point_eye()
-        textnp.set_bin("fixed", 0)
-        textnp.set_depth_test(False)
-        textnp.set_depth_write(False)
-        textnp.set_shader_auto(True)
-        textnp.set_color_scale((0, 0, 0, 1))
-        textnp.set_light_off()
-        textnp.hide()
+        pool = floatingtext.get_instance()
 
         def func():
+            textnp = pool.acquire(self.rendernp, value)
             textnp.set_pos(target.as_nodepath, 0, 0, 2)
             intervals.Sequence(
-                intervals.Func(textnp.show),
                 intervals.LerpPosInterval(
                     textnp,
                     1.0,
                     textnp.get_pos() + p3d.LVector3(0, 0, 0.5)
                 ),
-                intervals.Func(textnp.remove_node),
+                intervals.Func(pool.release, textnp),
             ).start()
 
         return intervals.Func(func)
 
     #
-    # Basic Effects
+    # Events
     #
-    def change_stat(self, target, parameters):
-        stat = parameters['stat']
-        local_str_fac = parameters.get('strength_factor', 1)
+    def ability_used(self, _event):
+        return intervals.Sequence()
+
+    def change_stat(self, event):
         seq = intervals.Sequence()
-        strength = self.strength * local_str_fac
-        if parameters.get('show_result', True):
-            if self.is_hit:
-                result = self.CHANGE_STATE_PREFIX.get(stat, '') + f'{strength * -1:+}'
-                if self.is_crit:
+        if event.show_result:
+            if event.is_hit:
+                result = self.CHANGE_STATE_PREFIX.get(event.stat, '') + f'{event.delta:+}'
+                if event.is_crit:
                     result += ' (CRIT!)'
             else:
                 result = 'Miss'
-            seq.append(self.show_result(target, result))
-        def func():
-            if self.is_hit:
-                setattr(target, stat, getattr(target, stat) - strength)
-        seq.append(intervals.Func(func))
+            seq.append(self.show_result(event.combatant, result))
+        seq.append(intervals.Func(combatresolver.apply_event, event))
         return seq
 
-    def play_animation(self, target, parameters):
-        anims = parameters.get('animation_name', [])
-        if isinstance(anims, str):
-            anims = [anims]
-        anims.insert(0, self.ability.id)
-        anims.append('attack')
-        return target.actor_interval(anims)
-
-    def play_vfx(self, target, parameters):
-        vfxnames = parameters.get('vfx', [])
-        duration = parameters.get('duration', 1.0)
-        if isinstance(vfxnames, str):
-            vfxnames = [vfxnames]
-
-        def create_vfx(vfxname):
-            particles = ParticleEffect()
-            if pman.is_frozen():
-                vfxpath = f'assets/vfx/{vfxname}.ptf'
-            else:
-                vfxpath = f'.built_assets/vfx/{vfxname}.ptf'
-            particles.loadConfig(vfxpath)
-            particles.set_shader_auto(True)
-            return particles
-        vfx = [create_vfx(i) for i in vfxnames]
-
-        def start_particle(effect):
-            effect.start(parent=target.as_nodepath)
+    def play_animation(self, event):
+        return event.combatant.actor_interval(event.animations)
+
+    def play_vfx(self, event):
+        pool = vfxpool.get_instance()
         return intervals.Parallel(*[
-            intervals.Sequence(
-                intervals.Func(start_particle, i),
-                intervals.Wait(duration),
-                intervals.Func(i.cleanup),
-            )
-            for i in vfx
+            pool.interval(i, event.combatant.as_nodepath, event.duration)
+            for i in event.vfx
         ])
 
-    def move_to_range(self, target, parameters):
-        target_range = parameters['range']
-        hit_required = parameters.get('is_hit_dependent', False)
-
-        if hit_required and not self.is_hit:
-            return intervals.Sequence()
-
-        seq = self.combat.move_combatant_to_range(
-            target,
-            target.target,
-            target_range
-        )
-        return seq
-
-    def move_to_start(self, target, _parameters):
-        target_pos = self.initial_position
+    def move(self, event):
         return self.combat.move_combatant_to_tile(
-            target,
-            target_pos
+            event.combatant,
+            event.to_tile
         )
 
-    #
-    # Template Effects
-    #
-    def template_simple(self, target, parameters):
-        sequence = intervals.Sequence()
-        if 'stat' not in parameters:
-            parameters['stat'] = 'current_hp'
-        if 'start_range' in parameters:
-            parameters['range'] = parameters['start_range']
-            sequence.append(self.move_to_range(self.combatant, parameters))
-        if 'animation_name' not in parameters and self.ability.type == 'magical':
-            parameters['animation_name'] = 'magic'
-        if 'vfx' not in parameters and self.ability.type == 'magical':
-            parameters['vfx'] = ['dust']
-        elif 'vfx' not in parameters:
-            parameters['vfx'] = ['sparks']
-
-        sequence.extend(intervals.Sequence(
-            self.play_animation(self.combatant, parameters),
-            self.play_vfx(target, parameters),
-            self.change_stat(target, parameters),
-        ))
-
-        if 'start_range' in parameters:
-            if 'end_range' in parameters:
-                parameters['range_index'] = parameters['end_range']
-            else:
-                parameters['range_index'] = parameters['start_range']
-            sequence.append(self.move_to_range(self.combatant, parameters))
-
-        return sequence
-
+    HANDLERS = {
+        combatresolver.AbilityUsed: ability_used,
+        combatresolver.StatChange: change_stat,
+        combatresolver.PlayAnimation: play_animation,
+        combatresolver.PlayVfx: play_vfx,
+        combatresolver.Move: move,
+        combatresolver.Knockback: move,
+    }
 
 def sequence_from_ability(rendernp, combatant, ability, combat):
     return SequenceBuilder(rendernp, combatant, ability, combat).as_sequence()
@@ -0,0 +1,70 @@
+import collections
+
+import panda3d.core as p3d
+
+
+class FloatingTextPool:
+    """Recycles the floating text nodes used to show combat results
+
+    Pooled nodes keep their render state between uses, and the geometry
+    generated for each string is cached (up to max_cached strings) so
+    repeated results such as "Miss" are only laid out once.
+    """
+    def __init__(self, max_cached=256):
+        self.max_cached = max_cached
+        self.textnode = p3d.TextNode('floating text')
+        self.textnode.set_align(p3d.TextNode.ACenter)
+        self.created = 0
+        self._geometry = collections.OrderedDict()
+        self._idle = []
+
+    def get_geometry(self, text):
+        if text in self._geometry:
+            self._geometry.move_to_end(text)
+        else:
+            self.textnode.set_text(text)
+            self._geometry[text] = p3d.NodePath(self.textnode.generate())
+            if len(self._geometry) > self.max_cached:
+                self._geometry.popitem(last=False)
+        return self._geometry[text]
+
+    def _create(self):
+        self.created += 1
+        textnp = p3d.NodePath('floating text')
+        textnp.set_billboard_point_eye()
+        textnp.set_bin("fixed", 0)
+        textnp.set_depth_test(False)
+        textnp.set_depth_write(False)
+        textnp.set_shader_auto(True)
+        textnp.set_color_scale((0, 0, 0, 1))
+        textnp.set_light_off()
+        return textnp
+
+    def acquire(self, parent, text):
+        textnp = self._idle.pop() if self._idle else self._create()
+        if textnp.get_tag('text') != text or textnp.get_num_children() == 0:
+            textnp.node().remove_all_children()
+            self.get_geometry(text).instance_to(textnp)
+            textnp.set_tag('text', text)
+        textnp.reparent_to(parent)
+        return textnp
+
+    def release(self, textnp):
+        textnp.detach_node()
+        self._idle.append(textnp)
+
+    def clear(self):
+        for textnp in self._idle:
+            textnp.remove_node()
+        self._idle.clear()
+        self._geometry.clear()
+
+
+_INSTANCE = None
+
+
+def get_instance():
+    global _INSTANCE # pylint: disable=global-statement
+    if _INSTANCE is None:
+        _INSTANCE = FloatingTextPool()
+    return _INSTANCE
@@ -0,0 +1,19 @@
+import types
+
+
+def freeze(value):
+    """Recursively replace lists with tuples and dicts with read-only mappings"""
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(i) for i in value)
+    if isinstance(value, (dict, types.MappingProxyType)):
+        return types.MappingProxyType({k: freeze(v) for k, v in value.items()})
+    return value
+
+
+def thaw(value):
+    """Return a plain list and dict copy of a frozen value"""
+    if isinstance(value, (list, tuple)):
+        return [thaw(i) for i in value]
+    if isinstance(value, (dict, types.MappingProxyType)):
+        return {k: thaw(v) for k, v in value.items()}
+    return value
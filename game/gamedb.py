@@ -1,69 +1,164 @@
-import collections
+import collections.abc
+import concurrent.futures
+import copy
+import hashlib
+import itertools
+import io
 import json
 import os
+import pickle
 import pprint
 import sys
+import tracemalloc
 
 import fastjsonschema
+import panda3d.core as p3d
 
+from . import abilityplan
+from . import datasource
+from . import loadprofile
 from . import pathutils
+from . import validatorcache
+from .frozen import freeze, thaw
+
+
+SNAPSHOT_VERSION = 5
+SNAPSHOT_MAGIC = b'MERCGDB' + bytes([SNAPSHOT_VERSION])
+SNAPSHOT_FILE = 'gamedb-{}.snapshot'
+
+
+class GameDBLoadError(RuntimeError):
+    def __init__(self, dirname, errors):
+        self.errors = errors
+        msg = '\n'.join(
+            [f'Failed to load {len(errors)} {dirname} file(s):']
+            + [f'  {path}: {error}' for path, error in errors]
+        )
+        super().__init__(msg)
 
 
 class DataModel:
+    # Interned tag masks are derived from the tags when the category is
+    # indexed, so they are not part of the record state
+    __slots__ = ('tag_mask', 'required_tag_mask')
     _props = []
     _links = {}
     _schema = {}
+    _frozen = False
+    _validate_func = None
 
-    def __init__(self, dict_data):
-        self.validate(dict_data)
-        self._props |= {'id', 'name'}
+    def __init__(self, dict_data, validate=True):
+        if validate:
+            self.validate(dict_data)
         for prop in self._props:
-            setattr(self, prop, dict_data[prop])
+            value = dict_data[prop]
+            if self._frozen:
+                value = freeze(value)
+            object.__setattr__(self, prop, value)
+        object.__setattr__(self, 'tag_mask', 0)
+        object.__setattr__(self, 'required_tag_mask', 0)
+
+    def __setattr__(self, name, value):
+        if self._frozen:
+            raise AttributeError(f'{type(self).__name__} is read-only')
+        super().__setattr__(name, value)
+
+    def __delattr__(self, name):
+        if self._frozen:
+            raise AttributeError(f'{type(self).__name__} is read-only')
+        super().__delattr__(name)
+
+    def __getstate__(self):
+        # Read-only mappings cannot be pickled, so frozen values are stored
+        # as plain lists and dicts and frozen again on load
+        return {
+            prop: thaw(getattr(self, prop)) if self._frozen else getattr(self, prop)
+            for prop in type(self).__slots__
+        }
+
+    def __setstate__(self, state):
+        for prop, value in state.items():
+            if self._frozen:
+                value = freeze(value)
+            object.__setattr__(self, prop, value)
+        object.__setattr__(self, 'tag_mask', 0)
+        object.__setattr__(self, 'required_tag_mask', 0)
 
     def __repr__(self):
         return '{}({})'.format(
             type(self).__name__,
-            pprint.pformat(self.__dict__)
+            pprint.pformat(self.__getstate__())
         )
 
     def link(self, gdb):
+        def resolve(gdbkey, linkname):
+            # Already linked records are resolved again by ID so relinking
+            # picks up records that have been replaced
+            if isinstance(linkname, DataModel):
+                linkname = linkname.id
+            return gdb[gdbkey][linkname]
+
         for prop, gdbkey in self._links.items():
             linkname = getattr(self, prop)
-            if isinstance(linkname, list):
-                linkval = [
-                    gdb[gdbkey][i]
+            if isinstance(linkname, (list, tuple)):
+                linkval = type(linkname)(
+                    resolve(gdbkey, i)
                     for i in linkname
-                ]
+                )
             else:
-                linkval = gdb[gdbkey][linkname]
-            setattr(self, prop, linkval)
+                linkval = resolve(gdbkey, linkname)
+            object.__setattr__(self, prop, linkval)
 
-    def to_dict(self):
-        def _ga(prop):
-            return getattr(self, prop)
+    def intern_tags(self, gdb):
+        object.__setattr__(self, 'tag_mask', gdb.tag_mask(getattr(self, 'tags', ())))
+        object.__setattr__(
+            self,
+            'required_tag_mask',
+            gdb.tag_mask(getattr(self, 'required_tags', ()))
+        )
 
-        return {
-            prop: _ga(prop).id if isinstance(_ga(prop), DataModel) else _ga(prop)
-            for prop in self._props
-        }
+    def update_from(self, other):
+        for prop in type(self).__slots__:
+            object.__setattr__(self, prop, getattr(other, prop))
+
+    def to_dict(self):
+        data = {}
+        for prop in self._props:
+            value = getattr(self, prop)
+            if isinstance(value, DataModel):
+                value = value.id
+            elif self._frozen:
+                value = thaw(value)
+            data[prop] = value
+        return data
 
     @classmethod
     def validate(cls, _data): # pylint: disable=unused-argument
         return True
 
+    @classmethod
+    def get_validator(cls):
+        # Load on first use so a GameDB restored from a snapshot never
+        # pays for validators it does not need
+        if cls._validate_func is None:
+            cls._validate_func = validatorcache.get_validator(cls._schema)
+        return cls._validate_func
+
     @classmethod
     def from_schema(cls, schema):
-        validate_func = fastjsonschema.compile(schema)
-        def validate(cls, data): # pylint: disable=unused-argument
+        def validate(cls, data):
             try:
-                validate_func(data)
+                cls.get_validator()(data)
             except fastjsonschema.exceptions.JsonSchemaException:
                 print(f"Failed to load {schema['title']}", file=sys.stderr)
                 pprint.pprint(schema)
                 raise
+        props = set(schema['properties'].keys()) | {'id', 'name'}
         model = type(schema['title'] + 'Model', (DataModel,), {
-            '_props': set(schema['properties'].keys()),
+            '__slots__': tuple(sorted(props)),
+            '_props': props,
             '_links': schema.get('links', {}),
+            '_frozen': not schema.get('mutable', False),
             '_schema': schema,
             'validate': classmethod(validate),
         })
@@ -71,9 +166,102 @@ class DataModel:
         return model
 
 
+def _load_worker_config():
+    # Workers may be spawned rather than forked, in which case they do not
+    # see the configuration the parent process loaded
+    validator_cache = p3d.ConfigVariableBool('mercury-validator-cache', True).get_value()
+    return '\n'.join([
+        f'mercury-cache-dir {pathutils.get_cache_dir()}',
+        f'mercury-validator-cache {"#t" if validator_cache else "#f"}',
+    ])
+
+
+_WORKER_STATE = {}
+
+
+def _init_load_worker(source, schema, config):
+    p3d.load_prc_file_data('gamedb load worker', config)
+    _WORKER_STATE.clear()
+    _WORKER_STATE.update({
+        'source': source,
+        'schema': schema,
+        'validator': None,
+    })
+
+
+def _load_worker_file(key, filename, profiled):
+    # The source is opened and the validator loaded once per worker, tasks
+    # only carry file names
+    entries = []
+    if _WORKER_STATE['validator'] is None:
+        profile = loadprofile.LoadProfile(
+            enabled=profiled,
+            track_allocations=tracemalloc.is_tracing()
+        )
+        with profile.measure('validator_compile', key, filename):
+            _WORKER_STATE['validator'] = validatorcache.get_validator(_WORKER_STATE['schema'])
+        entries = profile.entries
+    data, error, timings = _load_data_file(
+        _WORKER_STATE['source'],
+        key,
+        filename,
+        _WORKER_STATE['validator'],
+        profiled
+    )
+    return data, error, entries + timings
+
+
+def _load_data_file(source, key, filename, validator, profiled=False):
+    # Timings are collected locally and returned so they survive being
+    # loaded in a worker process
+    profile = loadprofile.LoadProfile(
+        enabled=profiled,
+        track_allocations=tracemalloc.is_tracing()
+    )
+    try:
+        with profile.measure('file_read', key, filename):
+            filedata = source.read(key, filename)
+        with profile.measure('json_parse', key, filename):
+            data = json.loads(filedata)
+        if not 'id' in data:
+            data['id'] = filename.rsplit('.', 1)[0]
+        with profile.measure('validation', key, filename):
+            validator(data)
+    except (OSError, ValueError, fastjsonschema.exceptions.JsonSchemaException) as exc:
+        return None, f'{type(exc).__name__}: {exc}', profile.entries
+    return data, None, profile.entries
+
+
+def _apply_defaults(schema, value):
+    if isinstance(value, dict):
+        for key, subschema in schema.get('properties', {}).items():
+            if key not in value and 'default' in subschema:
+                value[key] = copy.deepcopy(subschema['default'])
+            if key in value:
+                _apply_defaults(subschema, value[key])
+    elif isinstance(value, list) and isinstance(schema.get('items'), dict):
+        for item in value:
+            _apply_defaults(schema['items'], item)
+
+
+def _fill_nested_defaults(schema):
+    # The validator does not fill in defaults inside the defaults it inserts,
+    # so fold nested defaults into them up front
+    for subschema in schema.get('properties', {}).values():
+        _fill_nested_defaults(subschema)
+        if 'default' in subschema:
+            _apply_defaults(subschema, subschema['default'])
+    if isinstance(schema.get('items'), dict):
+        _fill_nested_defaults(schema['items'])
+
+
 def load_schema(schema_path):
     with open(schema_path) as schema_file:
-        schema = json.load(schema_file)
+        return prepare_schema(json.load(schema_file))
+
+
+def prepare_schema(schema):
+    _fill_nested_defaults(schema)
     schema['$schema'] = 'http://json-schema.org/draft-04/schema#'
     schema['type'] = 'object'
     schema['required'] = list(
@@ -85,64 +273,494 @@ def load_schema(schema_path):
     return schema
 
 
-class GameDB(collections.UserDict):
+class _SnapshotPickler(pickle.Pickler):
+    def __init__(self, file, tlk, model_keys):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.tlk = tlk
+        self.model_keys = model_keys
+
+    def persistent_id(self, obj):
+        if isinstance(obj, type) and obj in self.model_keys:
+            return ('model', self.model_keys[obj])
+        objkey = self.model_keys.get(type(obj), self.tlk)
+        if objkey != self.tlk:
+            # Records from other categories are stored as references and
+            # resolved (and loaded if needed) through the GameDB
+            return ('record', objkey, obj.id)
+        return None
+
+
+class _SnapshotUnpickler(pickle.Unpickler):
+    def __init__(self, file, gdb):
+        super().__init__(file)
+        self.gdb = gdb
+
+    def persistent_load(self, pid):
+        if pid[0] == 'model':
+            return self.gdb.schema_to_datamodel[pid[1]]
+        return self.gdb[pid[1]][pid[2]]
+
+
+class CategoryIndex:
+    def __init__(self, records, links):
+        self.ordered = tuple(sorted(records, key=lambda x: (x.name, x.id)))
+        self.by_tag = self._group(lambda x: getattr(x, 'tags', ()))
+        self.by_required_tag = self._group(lambda x: getattr(x, 'required_tags', ()))
+        self.by_type = self._group(lambda x: [getattr(x, 'type', None)])
+
+        # Reverse links keyed by the category and ID of the linked record
+        self.referrers = collections.defaultdict(list)
+        for record in self.ordered:
+            for prop, gdbkey in links.items():
+                linkval = getattr(record, prop)
+                if not isinstance(linkval, (list, tuple)):
+                    linkval = [linkval]
+                for target in linkval:
+                    if record not in self.referrers[(gdbkey, target.id)]:
+                        self.referrers[(gdbkey, target.id)].append(record)
+        self.referrers = {
+            key: tuple(value)
+            for key, value in self.referrers.items()
+        }
+
+        self._eligible = {}
+        self._excluding = {}
+
+    def _group(self, keyfunc):
+        groups = collections.defaultdict(list)
+        for record in self.ordered:
+            for key in keyfunc(record):
+                groups[key].append(record)
+        return {
+            key: tuple(value)
+            for key, value in groups.items()
+        }
+
+    def eligible(self, mask):
+        if mask not in self._eligible:
+            self._eligible[mask] = tuple(
+                record
+                for record in self.ordered
+                if not record.required_tag_mask & ~mask
+            )
+        return self._eligible[mask]
+
+    def excluding_required_tags(self, mask):
+        if mask not in self._excluding:
+            self._excluding[mask] = tuple(
+                record
+                for record in self.ordered
+                if not record.required_tag_mask & mask
+            )
+        return self._excluding[mask]
+
+
+class GameDB(collections.abc.Mapping):
     _ptr = None
     root_dir = pathutils.APP_ROOT_DIR.to_os_specific()
     data_dir = os.path.join(root_dir, 'data')
     schema_dir = os.path.join(data_dir, 'schemas')
-    schema_suffix = '.schema.json'
+    schema_suffix = datasource.SCHEMA_SUFFIX
+
+    # Immutable data derived from each record whenever its category is
+    # indexed, e.g., the execution plans of ability effects
+    compilers = {
+        'abilities': abilityplan.compile_ability,
+    }
 
     def __init__(self):
+        self.profile_format = p3d.ConfigVariableString('mercury-gamedb-profile', '').get_value()
+        self.load_profile = loadprofile.LoadProfile(
+            enabled=bool(self.profile_format),
+            track_allocations=p3d.ConfigVariableBool(
+                'mercury-gamedb-profile-allocations',
+                False
+            ).get_value()
+        )
+        self.source = self._open_source()
         self.schema_to_datamodel = {}
-        top_level_keys = [
-            i.replace(self.schema_suffix, '')
-            for i in os.listdir(self.schema_dir)
-            if i.endswith(self.schema_suffix)
-        ]
+        top_level_keys = self.source.schema_keys()
         for tlk in top_level_keys:
             if tlk in self.schema_to_datamodel:
                 continue
 
-            schema = load_schema(os.path.join(self.schema_dir, f'{tlk}{self.schema_suffix}'))
-            self.schema_to_datamodel[tlk] = DataModel.from_schema(schema)
+            with self.load_profile.measure('schema_load', tlk):
+                schema = prepare_schema(json.loads(self.source.read_schema(tlk)))
+                self.schema_to_datamodel[tlk] = DataModel.from_schema(schema)
 
-        super().__init__({
-            i: self._load_directory(i, self.schema_to_datamodel[i])
-            for i in top_level_keys
-            if os.path.exists(os.path.join(self.data_dir, i))
-        })
+        self._top_level_keys = [
+            i for i in top_level_keys
+            if self.source.has_category(i)
+        ]
+        self._categories = {}
+        self._indexes = {}
+        self._compiled = {}
+        self._file_stats = {}
+        self._file_ids = {}
+        self._loading = set()
+        self._tag_bits = {}
+        self.generation = 0
+        self.use_snapshot = p3d.ConfigVariableBool('mercury-gamedb-snapshot', True).get_value()
+
+    def _open_source(self):
+        hot_reload = p3d.ConfigVariableBool('mercury-gamedb-hot-reload', False).get_value()
+        if hot_reload and os.path.isdir(self.data_dir):
+            # Bundles never change, so watch the loose files instead
+            return datasource.DataDirectory(self.data_dir, self.schema_dir)
+
+        bundlepath = p3d.ConfigVariableString(
+            'mercury-data-bundle',
+            '$MAIN_DIR/assets/data.bundle'
+        ).get_value()
+        if bundlepath:
+            bundlepath = pathutils.parse_path(bundlepath).to_os_specific()
+            if os.path.exists(bundlepath):
+                if hot_reload:
+                    print(
+                        f'Warning: data is loaded from {bundlepath}, '
+                        'so hot-reload will not pick up any changes',
+                        file=sys.stderr
+                    )
+                return datasource.DataBundle(bundlepath)
+
+        # Fall back to loose files (e.g., during development)
+        return datasource.DataDirectory(self.data_dir, self.schema_dir)
+
+    def __getitem__(self, key):
+        if key not in self._categories:
+            if key not in self._top_level_keys:
+                raise KeyError(key)
+            self._load_category(key)
+            try:
+                self._build_index(key)
+            except:
+                del self._categories[key]
+                raise
+        return self._categories[key]
+
+    def __iter__(self):
+        return iter(self._top_level_keys)
+
+    def __len__(self):
+        return len(self._top_level_keys)
+
+    def __contains__(self, key):
+        return key in self._top_level_keys
+
+    @property
+    def materialized_categories(self):
+        return tuple(self._categories)
+
+    def _build_index(self, key):
+        #pylint: disable=protected-access
+        with self.load_profile.measure('indexing', key):
+            for record in self._categories[key].values():
+                record.intern_tags(self)
+            errors = self._compile(key) if key in self.compilers else []
+            self._indexes[key] = CategoryIndex(
+                self._categories[key].values(),
+                self.schema_to_datamodel[key]._links
+            )
+        if errors:
+            raise GameDBLoadError(key, errors)
+
+    def _compile(self, key):
+        compile_fn = self.compilers[key]
+        previous = self._compiled.get(key, {})
+        compiled = {}
+        errors = []
+        for filename, record_id in self._file_ids[key].items():
+            try:
+                compiled[record_id] = compile_fn(self._categories[key][record_id])
+            except (KeyError, TypeError, RuntimeError) as exc:
+                errors.append((os.path.join(key, filename), f'{type(exc).__name__}: {exc}'))
+                if record_id in previous:
+                    compiled[record_id] = previous[record_id]
+        self._compiled[key] = compiled
+        return errors
+
+    def compiled(self, key, record_id):
+        """Return the compiled form of a record (see GameDB.compilers)"""
+        _ = self[key]
+        return self._compiled[key][record_id]
+
+    def _get_index(self, key):
+        _ = self[key]
+        return self._indexes[key]
+
+    def sorted_values(self, key):
+        return self._get_index(key).ordered
+
+    def with_tag(self, key, tag):
+        return self._get_index(key).by_tag.get(tag, ())
+
+    def with_required_tag(self, key, tag):
+        return self._get_index(key).by_required_tag.get(tag, ())
+
+    def of_type(self, key, type_name):
+        return self._get_index(key).by_type.get(type_name, ())
+
+    def tag_mask(self, tags):
+        if isinstance(tags, int):
+            return tags
+
+        mask = 0
+        for tag in tags:
+            bit = self._tag_bits.get(tag)
+            if bit is None:
+                bit = 1 << len(self._tag_bits)
+                self._tag_bits[tag] = bit
+            mask |= bit
+        return mask
+
+    def tag_names(self, mask):
+        return frozenset(
+            tag
+            for tag, bit in self._tag_bits.items()
+            if mask & bit
+        )
+
+    def eligible(self, key, tags):
+        return self._get_index(key).eligible(self.tag_mask(tags))
+
+    def excluding_required_tags(self, key, tags):
+        return self._get_index(key).excluding_required_tags(self.tag_mask(tags))
+
+    def referrers(self, key, record_id):
+        #pylint: disable=protected-access
+        return {
+            tlk: self._get_index(tlk).referrers.get((key, record_id), ())
+            for tlk, model in self.schema_to_datamodel.items()
+            if tlk in self and key in model._links.values()
+        }
 
     def get_schema(self, key):
         #pylint: disable=protected-access
         return self.schema_to_datamodel[key]._schema
 
-    def _load_directory(self, dirname, data_model):
-        dirpath = os.path.join(self.data_dir, dirname)
+    def _load_category(self, tlk):
+        if tlk in self._loading:
+            raise RuntimeError(f'Circular reference while loading {tlk}')
+        self._loading.add(tlk)
+        try:
+            # Time spent loading a category that another category needs
+            # while linking or reading is not part of the other category
+            with self.load_profile.exclude():
+                self._file_stats[tlk] = self.source.scan(tlk)
+                snapshot_key = None
+                snapshot = None
+                if self.use_snapshot:
+                    with self.load_profile.measure('snapshot_read', tlk):
+                        snapshot_key = self.content_hash(tlk)
+                        snapshot = self._read_snapshot(tlk, snapshot_key)
+                if snapshot is not None:
+                    self._categories[tlk], self._file_ids[tlk] = snapshot
+                    return
+
+                records, file_ids = self._load_directory(tlk, self.schema_to_datamodel[tlk])
+                self._file_ids[tlk] = file_ids
+                # Register the records before linking so links back into this
+                # category can be resolved
+                self._categories[tlk] = records
+                try:
+                    for filename, record_id in file_ids.items():
+                        with self.load_profile.measure('linking', tlk, filename):
+                            records[record_id].link(self)
+                except:
+                    del self._categories[tlk]
+                    raise
+
+                if self.use_snapshot:
+                    with self.load_profile.measure('snapshot_write', tlk):
+                        self._write_snapshot(tlk, snapshot_key, (records, file_ids))
+        finally:
+            self._loading.discard(tlk)
+
+    def _remove_file_record(self, tlk, filename):
+        records = self._categories[tlk]
+        file_ids = self._file_ids[tlk]
+        record_id = file_ids.pop(filename, None)
+        if record_id in records and record_id not in file_ids.values():
+            del records[record_id]
+            return [(tlk, record_id)]
+        return []
+
+    def reload_changed(self):
+        changed = []
+        removed = []
+        for tlk in list(self._categories):
+            stats = self.source.scan(tlk)
+            prev_stats = self._file_stats[tlk]
+            if stats == prev_stats:
+                continue
+            self._file_stats[tlk] = stats
+            records = self._categories[tlk]
+            file_ids = self._file_ids[tlk]
+            data_model = self.schema_to_datamodel[tlk]
+
+            for filename in sorted(set(prev_stats) - set(stats)):
+                removed += self._remove_file_record(tlk, filename)
+
+            for filename in sorted(stats):
+                if prev_stats.get(filename) == stats[filename]:
+                    continue
+                data, error, timings = _load_data_file(
+                    self.source,
+                    tlk,
+                    filename,
+                    data_model.get_validator(),
+                    self.load_profile.enabled
+                )
+                self.load_profile.merge(timings)
+                if error is not None:
+                    print(f'Warning: could not reload {tlk}/{filename}: {error}', file=sys.stderr)
+                    continue
+                with self.load_profile.measure('model_construction', tlk, filename):
+                    record = data_model(data, validate=False)
+                try:
+                    with self.load_profile.measure('linking', tlk, filename):
+                        record.link(self)
+                except KeyError as exc:
+                    print(
+                        f'Warning: could not reload {tlk}/{filename}: missing {exc}',
+                        file=sys.stderr
+                    )
+                    continue
 
-        data_list = []
-        for filename in os.listdir(dirpath):
-            with open(os.path.join(dirpath, filename)) as datafile:
-                data = json.load(datafile)
-            if not 'id' in data:
-                data['id'] = filename.rsplit('.', 1)[0]
-            data_list.append(data)
+                if file_ids.get(filename, record.id) != record.id:
+                    removed += self._remove_file_record(tlk, filename)
+                if record.id in records:
+                    # Update in place so anything holding the record sees
+                    # the change
+                    records[record.id].update_from(record)
+                else:
+                    records[record.id] = record
+                file_ids[filename] = record.id
+                changed.append((tlk, record.id))
 
+        if not changed and not removed:
+            return []
 
-        for data in data_list:
+        # Relink only the records that link to something that changed
+        dirty = {tlk for tlk, _ in changed + removed}
+        for key, record_id in changed + removed:
+            for tlk, index in list(self._indexes.items()):
+                for referrer in index.referrers.get((key, record_id), ()):
+                    try:
+                        referrer.link(self)
+                    except KeyError as exc:
+                        print(
+                            f'Warning: {tlk}/{referrer.id} links to a missing record: {exc}',
+                            file=sys.stderr
+                        )
+                    dirty.add(tlk)
+        for tlk in dirty:
             try:
-                data_model.validate(data)
-            except fastjsonschema.exceptions.JsonSchemaException:
-                print(f"Failed to load {dirname}: {data['id']}")
-                raise
+                self._build_index(tlk)
+            except GameDBLoadError as exc:
+                # Records that fail to compile keep their previous compiled data
+                print(f'Warning: {exc}', file=sys.stderr)
 
-        return {
-            i['id']: data_model(i)
-            for i in data_list
+        self.generation += 1
+        return changed + removed
+
+    def content_hash(self, tlk):
+        hasher = hashlib.sha256(SNAPSHOT_MAGIC)
+        hasher.update(self.source.content_hash(tlk).encode('utf8'))
+        return hasher.digest()
+
+    def _snapshot_path(self, tlk):
+        return os.path.join(
+            pathutils.get_cache_dir().to_os_specific(),
+            SNAPSHOT_FILE.format(tlk)
+        )
+
+    def _read_snapshot(self, tlk, snapshot_key):
+        header = SNAPSHOT_MAGIC + snapshot_key
+        try:
+            with open(self._snapshot_path(tlk), 'rb') as snapfile:
+                if snapfile.read(len(header)) != header:
+                    return None
+                return _SnapshotUnpickler(snapfile, self).load()
+        except FileNotFoundError:
+            return None
+        except Exception as exc: # pylint: disable=broad-except
+            print(f'Warning: ignoring unreadable {tlk} snapshot: {exc}', file=sys.stderr)
+            return None
+
+    def _write_snapshot(self, tlk, snapshot_key, records):
+        model_keys = {
+            model: key
+            for key, model in self.schema_to_datamodel.items()
         }
+        buffer = io.BytesIO()
+        buffer.write(SNAPSHOT_MAGIC + snapshot_key)
+        _SnapshotPickler(buffer, tlk, model_keys).dump(records)
+
+        snappath = self._snapshot_path(tlk)
+        tmppath = f'{snappath}.{os.getpid()}.tmp'
+        try:
+            os.makedirs(os.path.dirname(snappath), exist_ok=True)
+            with open(tmppath, 'wb') as snapfile:
+                snapfile.write(buffer.getvalue())
+            os.replace(tmppath, snappath)
+        except OSError as exc:
+            print(f'Warning: could not write {tlk} snapshot: {exc}', file=sys.stderr)
+
+    def _load_directory(self, dirname, data_model):
+        filenames = self.source.filenames(dirname)
+        num_workers = p3d.ConfigVariableInt('mercury-gamedb-load-workers', 0).get_value()
+
+        # Parsing and validation are CPU bound, so only separate processes
+        # load files in parallel (threads were slower than a serial load)
+        if num_workers > 0 and len(filenames) > 1:
+            with concurrent.futures.ProcessPoolExecutor(
+                max_workers=num_workers,
+                initializer=_init_load_worker,
+                initargs=(
+                    self.source,
+                    data_model._schema, #pylint: disable=protected-access
+                    _load_worker_config(),
+                ),
+            ) as executor:
+                results = list(executor.map(
+                    _load_worker_file,
+                    itertools.repeat(dirname),
+                    filenames,
+                    itertools.repeat(self.load_profile.enabled),
+                    chunksize=max(len(filenames) // (num_workers * 4), 1),
+                ))
+        else:
+            with self.load_profile.measure('validator_compile', dirname):
+                validator = data_model.get_validator()
+            results = [
+                _load_data_file(
+                    self.source,
+                    dirname,
+                    filename,
+                    validator,
+                    self.load_profile.enabled
+                )
+                for filename in filenames
+            ]
+
+        for _, _, timings in results:
+            self.load_profile.merge(timings)
+        errors = [
+            (os.path.join(dirname, filename), error)
+            for filename, (_, error, _) in zip(filenames, results)
+            if error is not None
+        ]
+        if errors:
+            raise GameDBLoadError(dirname, errors)
 
-    def _link_models(self):
-        for key in self.keys():
-            _ = [model.link(self) for model in self[key].values()]
+        records = {}
+        file_ids = {}
+        for filename, (data, _, _) in zip(filenames, results):
+            with self.load_profile.measure('model_construction', dirname, filename):
+                records[data['id']] = data_model(data, validate=False)
+            file_ids[filename] = data['id']
+        return records, file_ids
 
     def to_dict(self):
         return {
@@ -156,8 +774,6 @@ class GameDB(collections.UserDict):
     def get_instance(cls):
         if cls._ptr is None:
             cls._ptr = cls()
-            #pylint: disable=protected-access
-            cls._ptr._link_models()
         return cls._ptr
 
 
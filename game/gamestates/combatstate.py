@@ -9,7 +9,9 @@ from ..monster import Monster
 from ..combatant import Combatant
 from ..commonlighting import CommonLighting
 from .. import bgnode
+from .. import combatresolver
 from .. import gamedb
+from .. import vfxpool
 
 from .gamestate import GameState
 
@@ -52,29 +54,14 @@ class Arena:
         return tuple([int(i) for i in tilenp.name.split('-')[-2:]])
 
     def tile_distance(self, tilea, tileb):
-        distvec = p3d.LVector2(tilea) - p3d.LVector2(tileb)
-        return int(abs(distvec.x) + abs(distvec.y))
+        return combatresolver.tile_distance(tilea, tileb)
 
     def tile_in_range(self, tile_coord, start, min_range, max_range):
         tiledist = self.tile_distance(start, tile_coord)
         return bool(min_range <= tiledist <= max_range)
 
     def tile_get_facing_to(self, from_tile, to_tile):
-        posa = p3d.LVector2(from_tile)
-        posb = p3d.LVector2(to_tile)
-
-        direction = posb - posa
-        direction.normalize()
-        direction.x = round(direction.x)
-        direction.y = round(direction.y)
-
-        facing = [int(i) for i in direction]
-
-        # Special cases
-        if abs(facing[0]) == 1 and abs(facing[1]) == 1:
-            facing[1] = 0
-
-        return tuple(facing)
+        return combatresolver.tile_get_facing_to(from_tile, to_tile)
 
     def find_tiles_in_range(self, start, min_range, max_range):
         tiles = []
@@ -254,12 +241,13 @@ class CombatState(GameState):
             }.get(self.player.rank, 8)
         else:
             num_enemies = len(self.player_combatants)
+        enemies = Monster.gen_random_batch(
+            [f'combatant{i}' for i in range(num_enemies)],
+            self.player.rank
+        )
         self.enemy_combatants = [
-            Combatant(
-                Monster.gen_random(f'combatant{i}', 1),
-                self.root_node
-            )
-            for i in range(num_enemies)
+            Combatant(enemy, self.root_node)
+            for enemy in enemies
         ]
         possible_positions = [
             (x, y)
@@ -293,6 +281,12 @@ class CombatState(GameState):
         # Set initial input state
         self.input_state = 'END_TURN'
 
+    def cleanup(self):
+        # Effects of sequences that did not run to the end are still counted
+        # against the live particle cap
+        vfxpool.get_instance().release_all()
+        super().cleanup()
+
     @property
     def combatants(self):
         return (
@@ -505,8 +499,7 @@ class CombatState(GameState):
             if self.combat_type == 'tournament':
                 oldforms = set([
                     form.name
-                    for form in gdb['forms'].values()
-                    if self.player.can_use_form(form)
+                    for form in gdb.eligible('forms', self.player.tag_mask)
                 ])
                 self.player.rank += 1
 
@@ -516,8 +509,7 @@ class CombatState(GameState):
 
                 newforms = set([
                     form.name
-                    for form in gdb['forms'].values()
-                    if self.player.can_use_form(form)
+                    for form in gdb.eligible('forms', self.player.tag_mask)
                 ]) - oldforms
                 results += [
                     f'New form available: {form}'
@@ -565,31 +557,15 @@ class CombatState(GameState):
             sequence.start()
         return sequence
 
-    def find_tile_at_range(self, combatant, other, target_range):
-        distance = self.arena.tile_distance(
-            combatant.tile_position,
-            other.tile_position
+    def arena_state(self):
+        return combatresolver.ArenaState.from_combatants(
+            self.arena.sizex,
+            self.arena.sizey,
+            self.combatants
         )
 
-        inc = 1 if target_range < distance else -1
-
-        new_pos = combatant.tile_position
-        for target in range(target_range, distance, inc):
-            direction = p3d.LVector2(self.arena.tile_get_facing_to(
-                combatant.tile_position,
-                other.tile_position
-            ))
-            other_pos = p3d.LVector2(other.tile_position)
-            pos = self.arena.vec_to_tile_coord(-direction * target + other_pos)
-            pos_legal = (
-                self.arena.tile_coord_in_bounds(pos)
-                and not self.combatant_in_tile(pos)
-            )
-            if pos_legal:
-                new_pos = pos
-                break
-
-        return new_pos
+    def find_tile_at_range(self, combatant, other, target_range):
+        return self.arena_state().find_tile_at_range(combatant, other, target_range)
 
     def move_combatant_to_range(self, combatant, other, target_range):
         new_pos = self.find_tile_at_range(combatant, other, target_range)
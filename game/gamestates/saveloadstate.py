@@ -21,7 +21,14 @@ def get_saves():
 
 
 def saves_exist():
-    return bool(get_saves())
+    savesdir = pathutils.get_saves_dir()
+    if not os.path.exists(savesdir):
+        return False
+
+    return any(
+        savepath.endswith('.sav')
+        for savepath in os.listdir(savesdir)
+    )
 
 
 class SaveState(GameState):
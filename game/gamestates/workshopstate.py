@@ -1,3 +1,4 @@
+import functools
 import itertools
 
 from direct.showbase.MessengerGlobal import messenger
@@ -5,6 +6,7 @@ from direct.interval import IntervalGlobal as intervals
 import panda3d.core as p3d
 
 from .. import gamedb
+from ..actorpool import ActorPool
 from ..monster import Monster, MonsterActor
 from ..commonlighting import CommonLighting
 from .. import bgnode
@@ -75,7 +77,13 @@ class WorkshopState(GameState):
         self.monster_selection = 0
 
         self.monster_actors = []
+        self.monster_labels = {}
         self.monsters_root = self.root_node.attach_new_node('monsters')
+        async_load = p3d.ConfigVariableBool('mercury-async-model-loading', True).get_value()
+        self.actor_pool = ActorPool(
+            self.monsters_root,
+            functools.partial(MonsterActor, async_load=async_load)
+        )
 
         # Setup lighting
         self.lights_root = self.root_node.attach_new_node('light root')
@@ -143,6 +151,10 @@ class WorkshopState(GameState):
         else:
             self.input_state = 'FOUNDRY'
 
+    def cleanup(self):
+        self.actor_pool.cleanup()
+        super().cleanup()
+
     def enter_state(self):
         super().enter_state()
 
@@ -199,8 +211,7 @@ class WorkshopState(GameState):
             self.input_state = 'MAIN'
         menu_items = [
             (form.name, get_monster, [form.id])
-            for form in gdb['forms'].values()
-            if self.player.can_use_form(form)
+            for form in gdb.eligible('forms', self.player.tag_mask)
         ]
         def foundry_reject():
             if self.player.monsters:
@@ -359,8 +370,10 @@ class WorkshopState(GameState):
                 change_weapon,
                 [weapon.id]
             )
-            for weapon in sorted(gdb['weapons'].values(), key=lambda x: x.name)
-            if self.current_monster.can_use_weapon(weapon, self.player.tags)
+            for weapon in gdb.eligible(
+                'weapons',
+                self.current_monster.tag_mask | self.player.tag_mask
+            )
         ])
         self.menu_helper.selection_change_cb = select
         self.menu_helper.reject_cb = reject
@@ -403,9 +416,7 @@ class WorkshopState(GameState):
         ])
 
     def load_monster_models(self, forms=None, weapons=None):
-        for monact in self.monster_actors:
-            monact.cleanup()
-            monact.remove_node()
+        self.actor_pool.release_all()
         self.monster_actors = []
         labels = []
 
@@ -423,24 +434,26 @@ class WorkshopState(GameState):
         stride = 2
         offset = 0
         for form, weapon, labelstr in zip(forms, weapons, labels):
-            actor = MonsterActor(form, self.monsters_root, weapon)
+            actor = self.actor_pool.acquire(form, weapon)
             actor.set_h(45)
             actor.set_pos(self.monsters_root, p3d.LVector3(offset, 0, 0))
             self.monster_actors.append(actor)
 
-            label = p3d.TextNode('monster label')
-            label.set_align(p3d.TextNode.ACenter)
-            label.set_text(labelstr)
-            labelnp = actor.attach_new_node(label)
-            labelnp.set_pos(0, 0, 2.3)
-            labelnp.set_scale(0.2)
-            labelnp.set_billboard_point_eye()
-            labelnp.set_bin("fixed", 0)
-            labelnp.set_depth_test(False)
-            labelnp.set_depth_write(False)
-            labelnp.set_shader_auto(True)
-            labelnp.set_color_scale((0, 0, 0, 1))
-            labelnp.set_light_off()
+            if actor not in self.monster_labels:
+                label = p3d.TextNode('monster label')
+                label.set_align(p3d.TextNode.ACenter)
+                labelnp = actor.attach_new_node(label)
+                labelnp.set_pos(0, 0, 2.3)
+                labelnp.set_scale(0.2)
+                labelnp.set_billboard_point_eye()
+                labelnp.set_bin("fixed", 0)
+                labelnp.set_depth_test(False)
+                labelnp.set_depth_write(False)
+                labelnp.set_shader_auto(True)
+                labelnp.set_color_scale((0, 0, 0, 1))
+                labelnp.set_light_off()
+                self.monster_labels[actor] = label
+            self.monster_labels[actor].set_text(labelstr)
 
             offset += stride
 
@@ -0,0 +1,153 @@
+import collections
+import contextlib
+import json
+import time
+import tracemalloc
+
+
+PHASES = [
+    'schema_load',
+    'validator_compile',
+    'snapshot_read',
+    'file_read',
+    'json_parse',
+    'validation',
+    'model_construction',
+    'linking',
+    'indexing',
+    'snapshot_write',
+]
+
+
+class LoadProfile:
+    def __init__(self, enabled=False, track_allocations=False):
+        self.enabled = enabled
+        self.track_allocations = enabled and track_allocations
+        self.entries = []
+        self._frames = []
+        self._started_tracing = False
+
+        if self.track_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def stop(self):
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        self.track_allocations = False
+
+    def add(self, phase, category, filename, seconds, allocated=0):
+        if self.enabled:
+            self.entries.append((phase, category, filename, seconds, allocated))
+
+    def merge(self, entries):
+        if self.enabled:
+            self.entries.extend(entries)
+
+    def _push_frame(self):
+        tracing = self.track_allocations and tracemalloc.is_tracing()
+        start_mem = tracemalloc.get_traced_memory()[0] if tracing else None
+        self._frames.append([time.perf_counter(), start_mem, 0.0, 0])
+
+    def _pop_frame(self):
+        start, start_mem, nested_seconds, nested_allocated = self._frames.pop()
+        seconds = time.perf_counter() - start
+        allocated = 0
+        if start_mem is not None and tracemalloc.is_tracing():
+            allocated = tracemalloc.get_traced_memory()[0] - start_mem
+        if self._frames:
+            self._frames[-1][2] += seconds
+            self._frames[-1][3] += allocated
+        return seconds - nested_seconds, allocated - nested_allocated
+
+    @contextlib.contextmanager
+    def measure(self, phase, category=None, filename=None):
+        # Only exclusive time is recorded, anything measured while this
+        # phase runs is subtracted from it
+        if not self.enabled:
+            yield
+            return
+
+        self._push_frame()
+        try:
+            yield
+        finally:
+            seconds, allocated = self._pop_frame()
+            self.add(phase, category, filename, seconds, allocated)
+
+    @contextlib.contextmanager
+    def exclude(self):
+        """Keep the time spent in this block out of the enclosing phase"""
+        if not self.enabled:
+            yield
+            return
+
+        self._push_frame()
+        try:
+            yield
+        finally:
+            self._pop_frame()
+
+    def totals(self, by_file=False):
+        totals = collections.defaultdict(lambda: [0, 0.0, 0])
+        for phase, category, filename, seconds, allocated in self.entries:
+            key = (category, filename if by_file else None, phase)
+            totals[key][0] += 1
+            totals[key][1] += seconds
+            totals[key][2] += allocated
+
+        def sort_key(item):
+            category, filename, phase = item[0]
+            return (category or '', filename or '', PHASES.index(phase))
+        return sorted(totals.items(), key=sort_key)
+
+    def to_dict(self):
+        def rows(by_file):
+            return [
+                {
+                    'category': category,
+                    'file': filename,
+                    'phase': phase,
+                    'count': count,
+                    'seconds': seconds,
+                    'allocated_bytes': allocated,
+                }
+                for (category, filename, phase), (count, seconds, allocated)
+                in self.totals(by_file)
+            ]
+        return {
+            'total_seconds': sum(i[3] for i in self.entries),
+            'categories': rows(False),
+            'files': [i for i in rows(True) if i['file'] is not None],
+        }
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), indent=4)
+
+    def to_table(self):
+        header = f'{"category":<12} {"file":<28} {"phase":<20} {"count":>6} ' \
+            f'{"ms":>10} {"KiB":>10}'
+        lines = [header, '-' * len(header)]
+        for by_file in (False, True):
+            for (category, filename, phase), (count, seconds, allocated) in self.totals(by_file):
+                if by_file and filename is None:
+                    continue
+                lines.append(
+                    f'{category or "":<12} {filename or "*":<28} {phase:<20} {count:>6} '
+                    f'{seconds * 1000:>10.3f} {allocated / 1024:>10.1f}'
+                )
+            lines.append('-' * len(header))
+        total = sum(i[3] for i in self.entries)
+        lines.append(f'{"total":<62} {total * 1000:>17.3f}')
+        return '\n'.join(lines)
+
+    def report(self, fmt='table'):
+        if fmt == 'json':
+            report = self.to_json()
+        elif fmt == 'table':
+            report = self.to_table()
+        else:
+            raise RuntimeError(f'Unknown load profile format: {fmt}')
+        self.stop()
+        return report
@@ -0,0 +1,119 @@
+import collections
+
+import panda3d.core as p3d
+
+
+def estimate_size(nodepath):
+    """Rough estimate of the bytes used by the geometry under nodepath"""
+    total = 0
+    geomnodes = [i.node() for i in nodepath.find_all_matches('**/+GeomNode')]
+    if isinstance(nodepath.node(), p3d.GeomNode):
+        geomnodes.append(nodepath.node())
+    for geomnode in geomnodes:
+        for geom in geomnode.get_geoms():
+            vdata = geom.get_vertex_data()
+            total += sum(
+                vdata.get_array(i).get_data_size_bytes()
+                for i in range(vdata.get_num_arrays())
+            )
+            for prim in geom.get_primitives():
+                indices = prim.get_vertices()
+                if indices is not None:
+                    total += indices.get_data_size_bytes()
+    return total
+
+
+def get_budget():
+    return p3d.ConfigVariableInt('mercury-model-cache-budget', 64).get_value() * 1024 * 1024
+
+
+class ModelCache:
+    """LRU cache of prepared models that evicts past a memory budget (in bytes)
+
+    The most recently requested model is always kept, even if it alone is
+    over budget. If load_async_fn is given, request() loads models in the
+    background; it is called with the key and a callback taking the model.
+    """
+    def __init__(self, load_fn, budget=None, size_fn=estimate_size, release_fn=None,
+                 load_async_fn=None):
+        self.load_fn = load_fn
+        self.load_async_fn = load_async_fn
+        self.size_fn = size_fn
+        self.release_fn = release_fn
+        self.budget = get_budget() if budget is None else budget
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._pending = {}
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        if key in self._entries:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key][0]
+
+        self.misses += 1
+        return self._add(key, self.load_fn(key))
+
+    def request(self, key, callback):
+        """Call callback with the model once it is loaded
+
+        Cached models are passed to the callback immediately.
+        """
+        if key in self._entries or self.load_async_fn is None:
+            callback(self.get(key))
+            return
+
+        if key in self._pending:
+            self._pending[key].append(callback)
+            return
+
+        self.misses += 1
+        self._pending[key] = [callback]
+        def loaded(model):
+            callbacks = self._pending.pop(key)
+            if key in self._entries:
+                # Already loaded synchronously while this was in flight
+                if self.release_fn is not None:
+                    self.release_fn(model)
+                model = self.get(key)
+            else:
+                model = self._add(key, model)
+            for pending_cb in callbacks:
+                pending_cb(model)
+        self.load_async_fn(key, loaded)
+
+    def is_pending(self, key):
+        return key in self._pending
+
+    def _add(self, key, model):
+        size = self.size_fn(model)
+        self._entries[key] = (model, size)
+        self.size += size
+        self._evict()
+        return model
+
+    def _evict(self):
+        while self.size > self.budget and len(self._entries) > 1:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        model, size = self._entries.pop(key)
+        self.size -= size
+        if self.release_fn is not None:
+            self.release_fn(model)
+
+    def discard(self, key):
+        if key in self._entries:
+            self._remove(key)
+
+    def clear(self):
+        for key in list(self._entries):
+            self._remove(key)
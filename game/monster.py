@@ -1,6 +1,7 @@
 import builtins
 import collections
 import random
+import time
 
 import panda3d.core as p3d
 from direct.actor.Actor import Actor
@@ -8,6 +9,8 @@ from direct.interval import IntervalGlobal as intervals
 
 from . import gamedb
 from . import effects
+from . import modelcache
+from . import counted
 
 
 RANDOM_NAMES = [
@@ -34,72 +37,255 @@ RANDOM_NAMES = [
 ]
 
 
+class AnimTable:
+    """Resolves requested animation names (or fallback chains) for a form"""
+    def __init__(self, form, anim_names, expected=(), warn=True):
+        self.anim_names = frozenset(anim_names)
+        self.anim_map = dict(form.anim_map)
+        self._resolved = {}
+
+        # Diagnose problems once when the table is built rather than on
+        # every playback
+        self.missing = {
+            name
+            for name in set(expected) | set(self.anim_map)
+            if self.resolve(name) not in self.anim_names
+        }
+        for name in sorted(self.missing if warn else ()):
+            target = self.resolve(name)
+            if target is None:
+                print(f'Warning: {form.name} is missing an animation: {name}')
+            else:
+                print(f'Warning: {form.name} maps {name} to a missing animation: {target}')
+
+    def resolve(self, anims):
+        if anims not in self._resolved:
+            chain = [anims] if isinstance(anims, str) else anims
+            mapped = None
+            for anim in chain:
+                if anim in self.anim_names:
+                    mapped = anim
+                    break
+                if anim in self.anim_map:
+                    mapped = self.anim_map[anim]
+                    break
+            self._resolved[anims] = mapped
+        return self._resolved[anims]
+
+
+def get_anim_unload_time():
+    return p3d.ConfigVariableDouble('mercury-anim-unload-time', 60.0).get_value()
+
+
 class MonsterActor:
+    _anim_tables = {}
+    _anim_tables_generation = None
     _anim_warnings = collections.defaultdict(set)
     _ANIMS = None
     _ANIM_FILE = 'models/golem_animations.bam'
+    FALLBACK_FORM = ('fallback_form', 'GolemSkeleton')
+    _model_cache = None
+    _weapon_cache = None
+    _weapon_attachments = {}
+    _weapon_attachments_generation = None
 
-    def __init__(self, form, parent_node=None, weapon=None):
+    def __init__(self, form, parent_node=None, weapon=None, async_load=False):
         self.form = form
-
-        mesh = self.form.mesh
+        self.weapon_id = None
+        self._weapon = None
+        self._weapon_np = None
+        self._weapon_joint = None
+        self.async_load = async_load
+        self._model_key = None
+        self._anim_last_used = {}
 
         if hasattr(builtins, 'base'):
-            if self._ANIMS is None:
-                anim_root = base.loader.load_model(self._ANIM_FILE)
-                self.__class__._ANIMS = p3d.NodePath('anims')
-                for bundle in anim_root.find_all_matches('**/+AnimBundleNode'):
-                    bundle.reparent_to(self._ANIMS)
-            model = base.loader.load_model('models/{}.bam'.format(mesh['bam_file']))
-            root_node = model.find('**/{}'.format(mesh['root_node']))
-            if root_node.is_empty():
-                print(
-                    f"Warning: root node ({mesh['root_node']}) not found in "
-                    f"bam_file ({mesh['bam_file']}) for {form.id}"
-                )
-            else:
-                self._ANIMS.instance_to(root_node)
-            self._path = Actor(root_node)
+            cache = self.get_model_cache()
+            model_key = self.model_key(form)
+            loaded = model_key in cache # pylint: disable=unsupported-membership-test
+            if async_load and not loaded:
+                # Show the placeholder until the real model streams in
+                model_key = self.FALLBACK_FORM
+
+            self._model_key = model_key
+            self._path = Actor(other=cache.get(model_key))
             if weapon:
                 self.update_weapon(weapon)
             self.play_anim('idle', loop=True)
             if parent_node:
                 self._path.reparent_to(parent_node)
+
+            if async_load and not loaded:
+                cache.request(self.model_key(form), self._swap_model)
         else:
             self._path = Actor()
 
+    @staticmethod
+    def model_key(form):
+        return (form.mesh['bam_file'], form.mesh['root_node'])
+
+    @classmethod
+    def get_model_cache(cls):
+        if cls._model_cache is None:
+            cls._model_cache = modelcache.ModelCache(
+                cls._load_prototype,
+                release_fn=Actor.cleanup,
+                load_async_fn=cls._load_prototype_async
+            )
+        return cls._model_cache
+
+    @classmethod
+    def _get_anims(cls):
+        """The shared animation library as a dict of name to AnimBundleNode"""
+        if cls._ANIMS is None:
+            if not hasattr(builtins, 'base'):
+                return {}
+            anim_root = base.loader.load_model(cls._ANIM_FILE)
+            cls._ANIMS = {
+                bundle.node().get_bundle().get_name(): bundle
+                for bundle in anim_root.find_all_matches('**/+AnimBundleNode')
+            }
+        return cls._ANIMS
+
+    @classmethod
+    def _make_prototype(cls, model_key, model):
+        bam_file, root_node_name = model_key
+        root_node = model.find(f'**/{root_node_name}')
+        if root_node.is_empty():
+            print(
+                f"Warning: root node ({root_node_name}) not found in "
+                f"bam_file ({bam_file})"
+            )
+        # Animations are bound per actor on first use (see _use_anim)
+        return Actor(root_node)
+
+    @classmethod
+    def _load_prototype(cls, model_key):
+        model = base.loader.load_model(f'models/{model_key[0]}.bam')
+        return cls._make_prototype(model_key, model)
+
+    @classmethod
+    def _load_prototype_async(cls, model_key, callback):
+        cls._get_anims()
+        def loaded(model):
+            callback(cls._make_prototype(model_key, model))
+        base.loader.load_model(f'models/{model_key[0]}.bam', callback=loaded)
+
+    def _swap_model(self, prototype):
+        if self._path.is_empty():
+            # Cleaned up before the model finished loading
+            return
+
+        self._path.stop()
+        self._remove_weapon()
+        self._path.remove_part('modelRoot')
+        self._path.load_model(prototype, autoBindAnims=False)
+        self._model_key = self.model_key(self.form)
+        self._anim_last_used.clear()
+        if self._weapon is not None:
+            self.update_weapon(self._weapon)
+        self.play_anim('idle', loop=True)
+
+    def _remove_weapon(self):
+        if self._weapon_np is not None:
+            self._weapon_np.remove_node()
+            self._weapon_np = None
+        if self._weapon_joint is not None:
+            self._weapon_joint.remove_node()
+            self._weapon_joint = None
+
+    @classmethod
+    def get_weapon_cache(cls):
+        if cls._weapon_cache is None:
+            def load_async(bam_file, callback):
+                base.loader.load_model(f'models/{bam_file}.bam', callback=callback)
+            cls._weapon_cache = modelcache.ModelCache(
+                lambda bam_file: base.loader.load_model(f'models/{bam_file}.bam'),
+                load_async_fn=load_async
+            )
+        return cls._weapon_cache
+
+    def _get_weapon_joint(self):
+        if self._weapon_joint is None:
+            self._weapon_joint = self._path.expose_joint(None, 'modelRoot', 'weapon')
+        return self._weapon_joint
+
     def update_weapon(self, weapon):
         if isinstance(weapon,str):
             gdb = gamedb.get_instance()
             weapon = gdb['weapons'][weapon]
 
-        meshname = weapon.mesh['root_node']
-        if meshname == '':
+        # Weapons are swapped in place, so drop any previous weapon first
+        if self._weapon_np is not None:
+            self._weapon_np.remove_node()
+            self._weapon_np = None
+        self.weapon_id = weapon.id
+        self._weapon = weapon
+
+        if weapon.mesh['root_node'] == '':
+            return
+
+        key = self._attachment_key(weapon)
+        if key in self._weapon_attachments:
+            self._attach_weapon(self._weapon_attachments[key])
             return
-        weapon_joint = self._path.expose_joint(None, 'modelRoot', 'weapon')
-        modelroot = base.loader.load_model('models/{}.bam'.format(weapon.mesh['bam_file']))
+
+        def loaded(modelroot):
+            # Ignore stale loads if the weapon changed in the meantime
+            if self.weapon_id == weapon.id and not self._path.is_empty():
+                self._attach_weapon(self._make_attachment(weapon, modelroot))
+        if self.async_load:
+            self.get_weapon_cache().request(weapon.mesh['bam_file'], loaded)
+        else:
+            loaded(self.get_weapon_cache().get(weapon.mesh['bam_file']))
+
+    def _attachment_key(self, weapon):
+        # The joint scale depends on the displayed model, which may still be
+        # the placeholder
+        return (self.form.id, self._model_key, weapon.id, gamedb.get_instance().generation)
+
+    def _make_attachment(self, weapon, modelroot):
+        # Resolve the weapon mesh and its transform relative to the weapon
+        # joint once per form and weapon
+        key = self._attachment_key(weapon)
+        if key in self._weapon_attachments:
+            return self._weapon_attachments[key]
+
+        meshname = weapon.mesh['root_node']
+        weapon_joint = self._get_weapon_joint()
         mesh = modelroot.find(f'**/{meshname}')
+        attachment = None
         if mesh.is_empty():
             print(f'Warning: could not find weapon {meshname}')
             modelroot.ls()
-            return
         elif weapon_joint is None:
             print(f'Warning: could not find weapon joint on {self.form.name}')
-            return
+        else:
+            attachment = mesh.copy_to(p3d.NodePath())
+            weaponxf = self.form.weapon_offset
+            pos, hpr, scale = weaponxf['position'][:], weaponxf['hpr'][:], weaponxf['scale'][:]
+            pos = [i * 0.1 for i in pos]
+            pos[1] += 0.4
+            attachment.set_pos(mesh.get_pos() + p3d.LVector3(*pos))
+            attachment.set_hpr(*hpr)
+            scale = [
+                scale[idx] / inv
+                for idx, inv in enumerate(weapon_joint.get_scale())
+            ]
+            attachment.set_scale(*scale)
 
-        # Update weapon transform
-        weaponxf = self.form.weapon_offset
-        pos, hpr, scale = weaponxf['position'][:], weaponxf['hpr'][:], weaponxf['scale'][:]
-        pos = [i * 0.1 for i in pos]
-        pos[1] += 0.4
-        mesh.set_pos(mesh.get_pos() + p3d.LVector3(*pos))
-        mesh.set_hpr(*hpr)
-        scale = [
-            scale[idx] / inv
-            for idx, inv in enumerate(weapon_joint.get_scale())
-        ]
-        mesh.set_scale(*scale)
-        mesh.instance_to(weapon_joint)
+        if key[-1] != self._weapon_attachments_generation:
+            self._weapon_attachments.clear()
+            self.__class__._weapon_attachments_generation = key[-1]
+        self._weapon_attachments[key] = attachment
+        return attachment
+
+    def _attach_weapon(self, attachment):
+        if attachment is None:
+            return
+        if self._weapon_np is not None:
+            self._weapon_np.remove_node()
+        self._weapon_np = attachment.instance_to(self._get_weapon_joint())
 
     def __getattr__(self, name):
         return getattr(self._path, name)
@@ -116,14 +302,43 @@ class MonsterActor:
             baseanim = anim
         else:
             baseanim = anim[-1]
+        if baseanim in self.anim_table.missing:
+            # Already reported when the table was built
+            return
         if baseanim not in self._anim_warnings[self.form.id]:
             print(f'Warning: {self.form.name} is missing an animation: {anim}')
             self._anim_warnings[self.form.id].add(baseanim)
 
+    def _use_anim(self, anim):
+        if anim not in self._anim_last_used:
+            bundle = self._get_anims().get(anim)
+            if bundle is None:
+                return False
+            self._path.load_anims({anim: bundle})
+        self._anim_last_used[anim] = time.monotonic()
+        return True
+
+    def unload_unused_anims(self, max_age=None):
+        """Unbind animations that have not been played for max_age seconds"""
+        if max_age is None:
+            max_age = get_anim_unload_time()
+        cutoff = time.monotonic() - max_age
+        current = self._path.get_current_anim() if self._anim_last_used else None
+        stale = [
+            anim
+            for anim, last_used in self._anim_last_used.items()
+            if last_used <= cutoff and anim != current
+        ]
+        if stale:
+            self._path.unload_anims(stale)
+            for anim in stale:
+                del self._anim_last_used[anim]
+        return stale
+
     def play_anim(self, anim, *, loop=False):
         self._path.stop()
         mapped_anim = self.get_anim(anim)
-        if mapped_anim is None:
+        if mapped_anim is None or not self._use_anim(mapped_anim):
             self._anim_warning(anim)
             return
         if loop:
@@ -131,26 +346,65 @@ class MonsterActor:
         else:
             self._path.play(mapped_anim)
 
-    def get_anim(self, anims):
-        if isinstance(anims, str):
-            anims = [anims]
+    @property
+    def anim_table(self):
+        anims = self._get_anims()
+        if not anims:
+            # Without base there is no animation library to resolve against,
+            # so skip the warnings and do not cache a table missing everything
+            return AnimTable(self.form, anims, warn=False)
 
-        for anim in anims:
-            if anim in self._path.get_anim_names():
-                return anim
-            if anim in self.form.anim_map:
-                return self.form.anim_map[anim]
+        gdb = gamedb.get_instance()
+        key = (self.form.id, gdb.generation)
+        if key not in self._anim_tables:
+            # Animations come from the shared library, so every actor of a
+            # form has the same table whichever model it is showing
+            if key[-1] != self._anim_tables_generation:
+                self._anim_tables.clear()
+                self.__class__._anim_tables_generation = key[-1]
+            expected = gdb.get_schema('forms')['properties']['anim_map']['default']
+            self._anim_tables[key] = AnimTable(self.form, anims, expected)
+        return self._anim_tables[key]
 
-        return None
+    def get_anim(self, anims):
+        if not isinstance(anims, str):
+            anims = tuple(anims)
+        return self.anim_table.resolve(anims)
 
     def actor_interval(self, anim):
         mapped_anim = self.get_anim(anim)
-        if mapped_anim is None:
+        if mapped_anim is None or not self._use_anim(mapped_anim):
             self._anim_warning(anim)
             return intervals.Sequence()
         return self._path.actor_interval(mapped_anim)
 
 
+class LearnedAbilities(counted.CountedList):
+    """A list of learned ability IDs with set lookups that counts modifications"""
+    __slots__ = ('_ids',)
+
+    def __init__(self, iterable=()):
+        super().__init__(iterable)
+        self._ids = frozenset(self)
+
+    def __contains__(self, ability_id):
+        return ability_id in self._ids
+
+    def _modified(self):
+        super()._modified()
+        self._ids = frozenset(self)
+
+
+# base is the value provided by the form (form is its ID) and upgrades maps
+# the IDs of learned passive abilities to their contribution
+StatBreakdown = collections.namedtuple('StatBreakdown', [
+    'base',
+    'form',
+    'upgrades',
+    'total',
+])
+
+
 class Monster:
     BASE_STATS = [
         'hp',
@@ -159,20 +413,87 @@ class Monster:
         'movement',
     ]
     MAX_POWER = 6
+    _enemy_tables = {}
     def __init__(self, monsterdata):
         self._monsterdata = monsterdata
+        self._tags_key = None
+        self._tags = None
+        self._stats_version = 0
+        self._stats_key = None
+        self._stats = {}
+        self._abilities_key = None
+        self._abilities = ()
+
+        monsterdata.abilities_learned_form = LearnedAbilities(monsterdata.abilities_learned_form)
+        monsterdata.abilities_learned_weapon = LearnedAbilities(
+            monsterdata.abilities_learned_weapon
+        )
 
     def __getattr__(self, name):
         if name == 'hit_points':
             name = 'hp'
         if name in self.BASE_STATS:
-            base_stat = getattr(self.form, name)
-            upgrades_contrib = self.upgrades_for_stat(name)
-            return base_stat + upgrades_contrib
+            return self.stat_breakdown(name).total
         return getattr(self._monsterdata, name)
 
+    def _derived_key(self):
+        # Derived data only changes with the form, weapon, learned abilities
+        # or power, so only recompute when one of those has changed. The form
+        # can be replaced on the monster itself, so key on what it reports
+        monsterdata = self._monsterdata
+        return (
+            self._stats_version,
+            monsterdata.abilities_learned_form.version,
+            monsterdata.abilities_learned_weapon.version,
+            self.form,
+            self.weapon,
+            gamedb.get_instance().generation,
+        )
+
+    def stat_breakdown(self, stat):
+        key = self._derived_key()
+        if key != self._stats_key:
+            self._stats.clear()
+            self._stats_key = key
+
+        if stat not in self._stats:
+            upgrades = {}
+            for ability in self.abilities:
+                for passive in ability.passives:
+                    if passive['type'] == 'change_stat' and passive['parameters']['stat'] == stat:
+                        incr = effects.calculate_strength(self, ability)
+                        upgrades[ability.id] = upgrades.get(ability.id, 0) + incr
+            base = getattr(self.form, stat)
+            self._stats[stat] = StatBreakdown(
+                base,
+                self.form.id,
+                upgrades,
+                base + sum(upgrades.values())
+            )
+        return self._stats[stat]
+
+    @property
+    def abilities_learned_form(self):
+        return self._monsterdata.abilities_learned_form
+
+    @abilities_learned_form.setter
+    def abilities_learned_form(self, value):
+        self._monsterdata.abilities_learned_form = LearnedAbilities(value)
+        self._stats_version += 1
+
+    @property
+    def abilities_learned_weapon(self):
+        return self._monsterdata.abilities_learned_weapon
+
+    @abilities_learned_weapon.setter
+    def abilities_learned_weapon(self, value):
+        self._monsterdata.abilities_learned_weapon = LearnedAbilities(value)
+        self._stats_version += 1
+
     def to_dict(self, skip_extras=False):
         data = self._monsterdata.to_dict()
+        data['abilities_learned_form'] = list(data['abilities_learned_form'])
+        data['abilities_learned_weapon'] = list(data['abilities_learned_weapon'])
         if skip_extras:
             return data
 
@@ -204,10 +525,9 @@ class Monster:
         if form_id is not None:
             form = gdb['forms'][form_id]
         else:
-            form = random.choice([
-                i for i in gdb['forms'].values()
-                if not set(i.required_tags) & {'disabled', 'in_test'}
-            ])
+            form = random.choice(
+                gdb.excluding_required_tags('forms', {'disabled', 'in_test'})
+            )
 
         monsterdata = gdb.schema_to_datamodel['monsters']({
             'id': monster_id,
@@ -233,44 +553,102 @@ class Monster:
             gdb = gamedb.get_instance()
             value = gdb['weapons'][value]
 
-        self._monsterdata.abilities_learned_weapon = []
+        self._monsterdata.abilities_learned_weapon = LearnedAbilities()
+        self._stats_version += 1
         self._monsterdata.weapon = value
 
     @classmethod
-    def gen_random(cls, monsterid, _level):
+    def _get_enemy_table(cls, level):
         gdb = gamedb.get_instance()
-        mon = cls.make_new(monsterid)
-        mon.weapon = random.choice(list(gdb['weapons'].values()))
-        return mon
+        key = (id(gdb), gdb.generation, level)
+        if key not in cls._enemy_tables:
+            rank_mask = gdb.tag_mask(f'rank_{i}' for i in range(level + 1))
+            forms = gdb.eligible('forms', rank_mask)
+            if not forms:
+                forms = gdb.excluding_required_tags('forms', {'disabled', 'in_test'})
+            cls._enemy_tables.clear()
+            cls._enemy_tables[key] = [
+                (
+                    form,
+                    gdb.eligible(
+                        'weapons',
+                        form.tag_mask | gdb.tag_mask([f'form_{form.id}']) | rank_mask
+                    ),
+                )
+                for form in forms
+            ]
+        return cls._enemy_tables[key]
+
+    @classmethod
+    def gen_random_batch(cls, monster_ids, level, rng=None):
+        if rng is None:
+            rng = random
+        level = max(1, level)
+        table = cls._get_enemy_table(level)
+
+        monsters = []
+        for monster_id in monster_ids:
+            form, weapons = rng.choice(table)
+            monster = cls.make_new(monster_id, rng.choice(RANDOM_NAMES), form.id)
+            monster.weapon = rng.choice(weapons)
+
+            # Higher levels get more power to spend on abilities
+            monster.power_available = min(level, cls.MAX_POWER)
+            learnable = [
+                (monster.abilities_learned_form, ability.id)
+                for ability in form.abilities
+            ] + [
+                (monster.abilities_learned_weapon, ability.id)
+                for ability in monster.weapon.abilities
+            ]
+            num_learned = min(monster.power_available, len(learnable))
+            for learned_list, ability_id in rng.sample(learnable, num_learned):
+                learned_list.append(ability_id)
+            monsters.append(monster)
+        return monsters
+
+    @classmethod
+    def gen_random(cls, monsterid, level, rng=None):
+        return cls.gen_random_batch([monsterid], level, rng)[0]
+
+    def _get_tags(self):
+        # The form can be swapped or hot-reloaded in place, so cache the
+        # tags against both
+        gdb = gamedb.get_instance()
+        key = (self.form, gdb.generation)
+        if key != self._tags_key:
+            tags = frozenset(self.form.tags) | {f'form_{self.form.id}'}
+            self._tags = (tags, gdb.tag_mask(tags))
+            self._tags_key = key
+        return self._tags
 
     @property
     def tags(self):
-        return {
-            f'form_{self.form.id}',
-        } | set(self.form.tags)
+        return self._get_tags()[0]
+
+    @property
+    def tag_mask(self):
+        return self._get_tags()[1]
 
     @property
     def abilities(self):
-        def filter_abilities(abilities, learned_list):
-            return [
-                ability
-                for ability in abilities
-                if ability.id in learned_list
-            ]
-        return (
-            filter_abilities(self.weapon.abilities, self.abilities_learned_weapon)
-            + filter_abilities(self.form.abilities, self.abilities_learned_form)
-        )
+        key = self._derived_key()
+        if key != self._abilities_key:
+            def filter_abilities(abilities, learned_list):
+                return tuple(
+                    ability
+                    for ability in abilities
+                    if ability.id in learned_list
+                )
+            self._abilities = (
+                filter_abilities(self.weapon.abilities, self.abilities_learned_weapon)
+                + filter_abilities(self.form.abilities, self.abilities_learned_form)
+            )
+            self._abilities_key = key
+        return self._abilities
 
     def upgrades_for_stat(self, stat):
-        total = 0
-        for ability in self.abilities:
-            for passive in ability.passives:
-                if passive['type'] == 'change_stat' and passive['parameters']['stat'] == stat:
-                    incr = effects.calculate_strength(self, ability)
-                    total += incr
-
-        return total
+        return sum(self.stat_breakdown(stat).upgrades.values())
 
     @property
     def power_available(self):
@@ -279,6 +657,7 @@ class Monster:
     @power_available.setter
     def power_available(self, value):
         self._monsterdata.power_available = value
+        self._stats_version += 1
 
     @property
     def power_spent(self):
@@ -288,6 +667,7 @@ class Monster:
         )
 
     def can_use_weapon(self, weapon, extra_tags=None):
-        if extra_tags is None:
-            extra_tags = set()
-        return set(weapon.required_tags).issubset(self.tags | extra_tags)
+        mask = self.tag_mask
+        if extra_tags is not None:
+            mask |= gamedb.get_instance().tag_mask(extra_tags)
+        return not weapon.required_tag_mask & ~mask
@@ -14,6 +14,7 @@ USER_CONFIG_DIR = p3d.Filename.from_os_specific(_APPDIRS.user_config_dir)
 
 _PATH_VARS = {
     '$USER_APPDATA': _APPDIRS.user_data_dir,
+    '$USER_CACHE': _APPDIRS.user_cache_dir,
     '$MAIN_DIR': str(APP_ROOT_DIR),
 }
 
@@ -34,3 +35,9 @@ def get_saves_dir():
     savespath = p3d.ConfigVariableString('mercury-saves-dir', '$USER_APPDATA/saves')
     savesdir = parse_path(savespath)
     return savesdir
+
+
+def get_cache_dir():
+    cachepath = p3d.ConfigVariableString('mercury-cache-dir', '$USER_CACHE')
+    cachedir = parse_path(cachepath)
+    return cachedir
@@ -2,10 +2,16 @@ import datetime
 import json
 import uuid
 
+from . import counted
 from . import gamedb
 from .monster import Monster
 
 
+class TagSet(counted.CountedSet):
+    """A set that counts modifications so derived tags can be cached"""
+    __slots__ = ()
+
+
 class PlayerData:
     MAX_RANK = 4
     def __init__(self):
@@ -13,6 +19,8 @@ class PlayerData:
         self.monsters = []
         self.saveid = None
         self.last_save = datetime.datetime.now()
+        self._tags_key = None
+        self._tags = None
         self.personal_tags = set()
         self.rank = 1
         self.num_power_gems = 0
@@ -34,13 +42,34 @@ class PlayerData:
         }
 
     def can_use_form(self, form):
-        return set(form.required_tags).issubset(self.tags)
+        return not form.required_tag_mask & ~self.tag_mask
+
+    @property
+    def personal_tags(self):
+        return self._personal_tags
+
+    @personal_tags.setter
+    def personal_tags(self, value):
+        self._personal_tags = TagSet(value)
+        self._tags_key = None
+
+    def _get_tags(self):
+        key = (self._personal_tags.version, self.rank)
+        if key != self._tags_key:
+            tags = frozenset(self._personal_tags) | {
+                f'rank_{i}' for i in range(self.rank+1)
+            }
+            self._tags = (tags, gamedb.get_instance().tag_mask(tags))
+            self._tags_key = key
+        return self._tags
 
     @property
     def tags(self):
-        return self.personal_tags | {
-            f'rank_{i}' for i in range(self.rank+1)
-        }
+        return self._get_tags()[0]
+
+    @property
+    def tag_mask(self):
+        return self._get_tags()[1]
 
     def save(self, file_object):
         self.last_save = datetime.datetime.now()
@@ -0,0 +1,153 @@
+import numpy as np
+
+from . import gamedb
+from .monster import Monster
+
+
+STATS = Monster.BASE_STATS
+ATTACK_STATS = {
+    'physical': 'physical_attack',
+    'magical': 'magical_attack',
+}
+
+_ABILITY_TABLES = {}
+
+
+class AbilityTable:
+    """Per-ability columns used to evaluate effects.calculate_strength and passives"""
+    def __init__(self, gdb):
+        abilities = gdb['abilities']
+        self.ids = tuple(abilities)
+        self.index = {ability_id: idx for idx, ability_id in enumerate(self.ids)}
+
+        records = list(abilities.values())
+        self.attack_stat = np.array([
+            STATS.index(ATTACK_STATS[i.type]) if i.type in ATTACK_STATS else -1
+            for i in records
+        ], dtype=np.int64)
+        self.uses_weapon_power = np.array([i.power == 'weapon' for i in records])
+        self.power = np.array([
+            0 if i.power == 'weapon' else i.power
+            for i in records
+        ], dtype=np.int64)
+
+        # Number of change_stat passives each ability has for each stat
+        self.passives = np.zeros((len(records), len(STATS)), dtype=np.int64)
+        for idx, ability in enumerate(records):
+            for passive in ability.passives:
+                if passive['type'] == 'change_stat' and passive['parameters']['stat'] in STATS:
+                    self.passives[idx, STATS.index(passive['parameters']['stat'])] += 1
+
+        self.stat_order = self._stat_order()
+
+    def _stat_order(self):
+        # A stat has to be computed after the attack stats used by the
+        # strength of its upgrades
+        depends = {
+            stat: {
+                STATS[attack_idx]
+                for attack_idx, count in zip(self.attack_stat, self.passives[:, stat_idx])
+                if count and attack_idx >= 0
+            }
+            for stat_idx, stat in enumerate(STATS)
+        }
+        order = []
+        while len(order) < len(STATS):
+            ready = [
+                stat
+                for stat in STATS
+                if stat not in order and depends[stat].issubset(order)
+            ]
+            if not ready:
+                raise RuntimeError(
+                    'Passive upgrades have circular stat dependencies: '
+                    f'{sorted(set(STATS) - set(order))}'
+                )
+            order += ready
+        return [STATS.index(i) for i in order]
+
+
+def get_ability_table(gdb=None):
+    if gdb is None:
+        gdb = gamedb.get_instance()
+    key = (id(gdb), gdb.generation)
+    if key not in _ABILITY_TABLES:
+        _ABILITY_TABLES.clear()
+        _ABILITY_TABLES[key] = AbilityTable(gdb)
+    return _ABILITY_TABLES[key]
+
+
+class RosterTable:
+    """Base and derived stats for a roster of golems, one row per golem
+
+    Entries are (form, weapon, abilities) tuples of GameDB records, where
+    abilities is the resolved ability sequence (see Monster.abilities).
+    """
+    def __init__(self, entries, gdb=None):
+        if gdb is None:
+            gdb = gamedb.get_instance()
+        self.abilities = get_ability_table(gdb)
+        num_rows = len(entries)
+
+        self.base = np.zeros((num_rows, len(STATS)), dtype=np.int64)
+        self.weapon_damage = np.zeros(num_rows, dtype=np.int64)
+        self.learned = np.zeros((num_rows, len(self.abilities.ids)), dtype=np.int64)
+        form_rows = {}
+        for row, (form, weapon, abilities) in enumerate(entries):
+            if form.id not in form_rows:
+                form_rows[form.id] = [getattr(form, stat) for stat in STATS]
+            self.base[row] = form_rows[form.id]
+            self.weapon_damage[row] = weapon.damage
+            for ability in abilities:
+                self.learned[row, self.abilities.index[ability.id]] += 1
+
+        self._evaluate()
+
+    @classmethod
+    def from_monsters(cls, monsters, gdb=None):
+        return cls(
+            [(i.form, i.weapon, i.abilities) for i in monsters],
+            gdb
+        )
+
+    def __len__(self):
+        return len(self.base)
+
+    def _strength(self, stats):
+        abilities = self.abilities
+        attack = np.where(
+            abilities.attack_stat >= 0,
+            stats[:, np.maximum(abilities.attack_stat, 0)],
+            1
+        )
+        power = np.where(
+            abilities.uses_weapon_power,
+            self.weapon_damage[:, np.newaxis],
+            abilities.power
+        )
+        return 1 + attack + power
+
+    def _evaluate(self):
+        self.upgrades = np.zeros_like(self.base)
+        self.stats = self.base.copy()
+        for stat_idx in self.abilities.stat_order:
+            strength = self._strength(self.stats)
+            contrib = self.learned * self.abilities.passives[:, stat_idx] * strength
+            self.upgrades[:, stat_idx] = contrib.sum(axis=1)
+            self.stats[:, stat_idx] = self.base[:, stat_idx] + self.upgrades[:, stat_idx]
+
+        # Strength of every ability for every golem (effects.calculate_strength)
+        self.strength = self._strength(self.stats)
+
+    def stat(self, stat):
+        if stat == 'hit_points':
+            stat = 'hp'
+        return self.stats[:, STATS.index(stat)]
+
+    def upgrades_for_stat(self, stat):
+        if stat == 'hit_points':
+            stat = 'hp'
+        return self.upgrades[:, STATS.index(stat)]
+
+    def ability_strength(self, ability_id):
+        return self.strength[:, self.abilities.index[ability_id]]
@@ -0,0 +1,103 @@
+import hashlib
+import importlib
+import importlib.util
+import json
+import os
+import sys
+
+import fastjsonschema
+import panda3d.core as p3d
+
+from . import pathutils
+
+
+SHIPPED_PACKAGE = 'schemavalidators'
+CACHE_SUBDIR = 'validators'
+
+_VALIDATORS = {}
+
+
+def schema_hash(schema):
+    schema_json = json.dumps(schema, sort_keys=True)
+    hashinput = f'{fastjsonschema.VERSION}\n{schema_json}'
+    return hashlib.sha256(hashinput.encode('utf8')).hexdigest()[:20]
+
+
+def module_name(schema):
+    return f"{schema['title'].lower()}_{schema_hash(schema)}"
+
+
+def get_cache_dir():
+    return os.path.join(pathutils.get_cache_dir().to_os_specific(), CACHE_SUBDIR)
+
+
+def write_validator_module(schema, outdir):
+    modname = module_name(schema)
+    modpath = os.path.join(outdir, f'{modname}.py')
+    tmppath = f'{modpath}.{os.getpid()}.tmp'
+    os.makedirs(outdir, exist_ok=True)
+    with open(tmppath, 'w', encoding='utf8') as modfile:
+        modfile.write(fastjsonschema.compile_to_code(schema))
+    os.replace(tmppath, modpath)
+    return modname
+
+
+def write_package(schemas, outdir):
+    modnames = [
+        write_validator_module(schema, outdir)
+        for schema in schemas
+    ]
+    with open(os.path.join(outdir, '__init__.py'), 'w', encoding='utf8') as initfile:
+        initfile.write('# Generated by game.validatorcache, do not edit\n')
+        initfile.write(f'MODULES = {sorted(modnames)!r}\n')
+
+
+def _import_shipped(modname):
+    try:
+        return importlib.import_module(f'{__package__}.{SHIPPED_PACKAGE}.{modname}')
+    except ImportError:
+        return None
+
+
+def _import_cached(cachedir, modname):
+    modpath = os.path.join(cachedir, f'{modname}.py')
+    if not os.path.exists(modpath):
+        return None
+
+    # The source loader writes bytecode next to the module, so later runs
+    # skip code generation and compilation entirely
+    spec = importlib.util.spec_from_file_location(f'mercury_validators.{modname}', modpath)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _load_module(schema, modname):
+    module = _import_shipped(modname)
+    if module is not None:
+        return module
+
+    if not p3d.ConfigVariableBool('mercury-validator-cache', True).get_value():
+        return None
+
+    cachedir = get_cache_dir()
+    try:
+        module = _import_cached(cachedir, modname)
+        if module is None:
+            write_validator_module(schema, cachedir)
+            module = _import_cached(cachedir, modname)
+    except Exception as exc: # pylint: disable=broad-except
+        print(f'Warning: could not use cached validator {modname}: {exc}', file=sys.stderr)
+        return None
+    return module
+
+
+def get_validator(schema):
+    modname = module_name(schema)
+    if modname not in _VALIDATORS:
+        module = _load_module(schema, modname)
+        if module is None:
+            _VALIDATORS[modname] = fastjsonschema.compile(schema)
+        else:
+            _VALIDATORS[modname] = module.validate
+    return _VALIDATORS[modname]
@@ -0,0 +1,122 @@
+import collections
+
+import panda3d.core as p3d
+from direct.interval import IntervalGlobal as intervals
+from direct.particles import ParticleEffect as particleeffect
+
+import pman
+
+
+def get_max_particles():
+    return p3d.ConfigVariableInt('mercury-max-live-particles', 20000).get_value()
+
+
+def vfx_path(vfxname):
+    if pman.is_frozen():
+        return f'assets/vfx/{vfxname}.ptf'
+    return f'.built_assets/vfx/{vfxname}.ptf'
+
+
+class VfxPool:
+    """Reuses ParticleEffects per vfx name and caps the number of live particles
+
+    Particle configs (.ptf files) are read and compiled once per vfx name.
+    An effect counts its particle pool sizes against max_particles while it
+    is acquired; acquire() returns None if starting it would go over the cap.
+    Effects still acquired when their sequence is abandoned are returned
+    with release_all().
+    """
+    def __init__(self, max_particles=None, path_fn=vfx_path):
+        self.max_particles = get_max_particles() if max_particles is None else max_particles
+        self.path_fn = path_fn
+        self.live_particles = 0
+        self.skipped = 0
+        self._configs = {}
+        self._live = set()
+        self._idle = collections.defaultdict(list)
+
+    def get_config(self, vfxname):
+        if vfxname not in self._configs:
+            vfxpath = self.path_fn(vfxname)
+            vfs = p3d.VirtualFileSystem.get_global_ptr()
+            data = vfs.read_file(vfxpath, True)
+            if not data:
+                raise RuntimeError(f'Could not read particle file: {vfxpath}')
+            self._configs[vfxname] = compile(data.replace(b'\r', b''), vfxpath, 'exec')
+        return self._configs[vfxname]
+
+    def _create(self, vfxname):
+        effect = particleeffect.ParticleEffect()
+        # Same environment ParticleEffect.loadConfig() runs .ptf files in
+        exec(self.get_config(vfxname), vars(particleeffect), {'self': effect}) # pylint: disable=exec-used
+        effect.set_shader_auto(True)
+        effect.vfx_name = vfxname
+        effect.particle_count = sum(
+            i.get_pool_size()
+            for i in effect.get_particles_list()
+        )
+        return effect
+
+    def acquire(self, vfxname):
+        idle = self._idle[vfxname]
+        effect = idle.pop() if idle else self._create(vfxname)
+        if self.live_particles + effect.particle_count > self.max_particles:
+            idle.append(effect)
+            self.skipped += 1
+            return None
+        self.live_particles += effect.particle_count
+        self._live.add(effect)
+        return effect
+
+    def release(self, effect):
+        if effect not in self._live:
+            # Already returned by release_all()
+            return
+        self._live.remove(effect)
+        effect.disable()
+        effect.clear_to_initial()
+        self.live_particles -= effect.particle_count
+        self._idle[effect.vfx_name].append(effect)
+
+    def release_all(self):
+        for effect in list(self._live):
+            self.release(effect)
+        self.live_particles = 0
+
+    def interval(self, vfxname, parent, duration):
+        """Play vfxname on parent for duration seconds
+
+        Effects are taken from the pool when they start playing, so the live
+        particle cap applies to what is actually on screen.
+        """
+        live = []
+        def start_particle():
+            effect = self.acquire(vfxname)
+            if effect is not None:
+                effect.start(parent=parent)
+                live.append(effect)
+        def stop_particle():
+            if live:
+                self.release(live.pop())
+        return intervals.Sequence(
+            intervals.Func(start_particle),
+            intervals.Wait(duration),
+            intervals.Func(stop_particle),
+        )
+
+    def clear(self):
+        self.release_all()
+        for effects in self._idle.values():
+            for effect in effects:
+                effect.cleanup()
+        self._idle.clear()
+
+
+_INSTANCE = None
+
+
+def get_instance():
+    global _INSTANCE # pylint: disable=global-statement
+    if _INSTANCE is None:
+        _INSTANCE = VfxPool()
+    return _INSTANCE
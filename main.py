@@ -1,3 +1,4 @@
+import atexit
 import os
 import sys
 
@@ -27,6 +28,9 @@ class GameApp(ShowBase):
         pman.shim.init(self)
         base.enable_particles()
         gdb = gamedb.get_instance()
+        if gdb.profile_format:
+            # Categories load lazily, so report once the game is done with them
+            atexit.register(lambda: print(gdb.load_profile.report(gdb.profile_format)))
 
         # Render pipeline
         self.set_background_color((0, 0, 0, 1))
@@ -86,6 +90,18 @@ class GameApp(ShowBase):
             return task.cont
         self.taskMgr.add(update_state, 'GameState Update')
 
+        # Data hot-reload
+        if p3d.ConfigVariableBool('mercury-gamedb-hot-reload', False).get_value():
+            reload_interval = p3d.ConfigVariableDouble(
+                'mercury-gamedb-hot-reload-interval',
+                1.0
+            ).get_value()
+            def reload_data(task):
+                for key, record_id in gdb.reload_changed():
+                    print(f'Reloaded {key}/{record_id}')
+                return task.again
+            self.taskMgr.do_method_later(reload_interval, reload_data, 'GameDB Hot Reload')
+
         # Get volume levels from config
         self.musicManager.set_volume(
             p3d.ConfigVariableDouble('audio-music-volume', 1.0).get_value()
@@ -1,21 +1,50 @@
+import os
+
 from setuptools import setup
 
 import pman.build_apps
 
+from game import datasource
+from game import gamedb
+from game import validatorcache
+
 CONFIG = pman.get_config()
 APP_NAME = CONFIG['general']['name']
+SCHEMA_DIR = os.path.join('data', 'schemas')
+
+
+class BuildApps(pman.build_apps.BuildApps):
+    def run(self):
+        # Ship generated schema validators so frozen builds never have to
+        # generate and compile them at runtime
+        validatorcache.write_package(
+            [
+                gamedb.load_schema(os.path.join(SCHEMA_DIR, i))
+                for i in sorted(os.listdir(SCHEMA_DIR))
+                if i.endswith(gamedb.GameDB.schema_suffix)
+            ],
+            os.path.join('game', validatorcache.SHIPPED_PACKAGE)
+        )
+
+        # Pack the loose data files into a single bundle that ends up in
+        # assets/ alongside the other built assets
+        datasource.write_bundle(
+            datasource.DataDirectory('data'),
+            os.path.join(CONFIG['build']['export_dir'], 'data.bundle')
+        )
+        super().run()
+
 
 setup(
     name=APP_NAME,
     cmdclass={
-        'build_apps': pman.build_apps.BuildApps,
+        'build_apps': BuildApps,
     },
     options={
         'build_apps': {
             'include_patterns': [
                 CONFIG['build']['export_dir']+'/**',
                 'config/**',
-                'data/**',
                 'CREDITS.md',
                 'LICENSE',
             ],
@@ -37,6 +66,7 @@ setup(
             'include_modules': {
                 APP_NAME: [
                     'direct.particles.ParticleManagerGlobal',
+                    f'game.{validatorcache.SHIPPED_PACKAGE}.*',
                 ]
             },
             'platforms': [
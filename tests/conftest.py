@@ -56,7 +56,11 @@ def player(monster):
 
 @pytest.fixture
 def combat():
+    from game.combatresolver import ArenaState
+
     class Combat:
+        def arena_state(self):
+            return ArenaState(10, 10)
         def move_combatant_to_tile(self, *_args, **_kwargs):
             return intervals.Sequence()
         def move_combatant_to_range(self, *_args, **_kwargs):
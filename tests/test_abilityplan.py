@@ -0,0 +1,49 @@
+import pytest
+
+from game import abilityplan
+from game.frozen import thaw
+
+
+def test_compile_all(gdb):
+    for ability in gdb['abilities'].values():
+        effects = thaw(ability.effects)
+        plan = gdb.compiled('abilities', ability.id)
+        assert plan
+        assert all(step.type in abilityplan.EFFECT_PARAMETERS for step in plan)
+        # Compiling never modifies the game data
+        assert thaw(ability.effects) == effects
+
+
+def test_template_simple(gdb):
+    plan = gdb.compiled('abilities', 'leap')
+    assert [step.type for step in plan] == [
+        'move_to_range',
+        'play_animation',
+        'play_vfx',
+        'change_stat',
+        'move_to_range',
+    ]
+    assert plan[1].parameters['animations'] == ('leap', 'attack')
+    assert plan[2].parameters['vfx'] == ('sparks',)
+    assert plan[3].target == 'other'
+    assert plan[3].parameters['stat'] == 'current_hp'
+
+    with pytest.raises(TypeError):
+        plan[3].parameters['stat'] = 'movement'
+
+
+def test_invalid_effects(gdb):
+    ability = gdb['abilities']['basic_attack']
+    class Ability:
+        id = ability.id
+        type = ability.type
+        effects = [{'type': 'explode'}]
+
+    with pytest.raises(RuntimeError, match='Unknown effect type'):
+        abilityplan.compile_ability(Ability)
+    Ability.effects = [{'type': 'change_stat'}]
+    with pytest.raises(RuntimeError, match='missing parameter: stat'):
+        abilityplan.compile_ability(Ability)
+    Ability.effects = [{'type': 'template_simple', 'target': 'everyone'}]
+    with pytest.raises(RuntimeError, match='Unknown effect target'):
+        abilityplan.compile_ability(Ability)
@@ -0,0 +1,86 @@
+import panda3d.core as p3d
+
+from game.actorpool import ActorPool
+
+
+class FakeActor:
+    created = 0
+
+    def __init__(self, form, parent_node, weapon):
+        FakeActor.created += 1
+        self.form = form
+        self.weapon_id = None
+        self.path = p3d.NodePath('actor')
+        self.path.reparent_to(parent_node)
+        self.weapon_swaps = 0
+        if weapon:
+            self.update_weapon(weapon)
+
+    def update_weapon(self, weapon):
+        self.weapon_id = weapon.id
+        self.weapon_swaps += 1
+
+    def reparent_to(self, parent):
+        self.path.reparent_to(parent)
+
+    def play_anim(self, _anim, *, loop=False):
+        pass
+
+    def stop(self):
+        pass
+
+    def unload_unused_anims(self):
+        pass
+
+    def cleanup(self):
+        pass
+
+    def remove_node(self):
+        self.path.remove_node()
+
+
+def test_reuse(gdb, empty_nodepath):
+    FakeActor.created = 0
+    pool = ActorPool(empty_nodepath, FakeActor)
+    mine = gdb['forms']['mine']
+    weapons = gdb['weapons']
+
+    first = pool.acquire(mine, weapons['unarmed'])
+    assert first.path.get_parent() == empty_nodepath
+    pool.release_all()
+    assert first.path.get_parent() == pool.parking_node
+    assert not pool.active
+
+    assert pool.acquire(mine, 'unarmed') is first
+    assert first.weapon_swaps == 1
+    pool.release_all()
+
+    # Weapons are swapped in place on an idle actor with the same form
+    assert pool.acquire(mine, weapons['claws']) is first
+    assert first.weapon_id == 'claws'
+    assert first.weapon_swaps == 2
+
+    second = pool.acquire(mine, weapons['claws'])
+    assert second is not first
+    assert FakeActor.created == 2
+
+    pool.cleanup()
+    assert first.path.is_empty()
+
+
+def test_reuse_unarmed(gdb, empty_nodepath):
+    pool = ActorPool(empty_nodepath, FakeActor)
+    mine = gdb['forms']['mine']
+
+    armed = pool.acquire(mine, gdb['weapons']['claws'])
+    pool.release_all()
+
+    # An armed actor is not handed out in place of an unarmed one
+    unarmed = pool.acquire(mine)
+    assert unarmed is not armed
+    assert unarmed.weapon_id is None
+    pool.release_all()
+
+    assert pool.acquire(mine) is unarmed
+    assert pool.acquire(mine, 'claws') is armed
+    pool.cleanup()
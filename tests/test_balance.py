@@ -0,0 +1,134 @@
+import functools
+import random
+import types
+
+import numpy as np
+
+from game import balance
+from game import combatresolver
+from game.abilityplan import EffectPlan
+from game.combatresolver import ArenaState
+from game.monster import Monster
+
+
+class FixedRolls:
+    def __init__(self, *rolls):
+        self.rolls = list(rolls)
+
+    def randrange(self, _start, _stop):
+        return self.rolls.pop(0)
+
+
+def make_monsters(count):
+    rng = random.Random(4321)
+    monsters = []
+    for idx in range(count):
+        monster = Monster.gen_random(f'balance{idx}', 3)
+        monster.abilities_learned_form = [i.id for i in monster.form.abilities]
+        monster.abilities_learned_weapon = [
+            i.id for i in monster.weapon.abilities if rng.random() < 0.5
+        ]
+        monsters.append(monster)
+    return monsters
+
+
+@functools.lru_cache(maxsize=None)
+def expected_turns(remaining, p_hit, p_crit, hit, crit):
+    if remaining <= balance.HP_EPSILON:
+        return 0
+    return (
+        1
+        + p_hit * (1 - p_crit) * expected_turns(remaining - hit, p_hit, p_crit, hit, crit)
+        + p_hit * p_crit * expected_turns(remaining - crit, p_hit, p_crit, hit, crit)
+    ) / p_hit
+
+
+def resolver_damage(attacker, defender, ability):
+    state = ArenaState(10, 10, {attacker: (0, 0), defender: (0, 1)})
+    total = 0
+    for hit_roll in range(99):
+        for crit_roll in range(99):
+            events = combatresolver.resolve_ability(
+                attacker, defender, ability, state, rng=FixedRolls(hit_roll, crit_roll)
+            )
+            for event in events:
+                if isinstance(event, combatresolver.StatChange):
+                    combatant, stat, delta, *_ = event
+                    if combatant is defender and stat == 'current_hp':
+                        total -= delta
+    return total / 99 ** 2
+
+
+def test_expected_damage_matches_resolver(gdb):
+    monsters = make_monsters(2)
+    attacker, defender = monsters[0], monsters[1]
+    table = balance.DamageTable([(i.form, i.weapon, i.abilities) for i in (attacker, defender)])
+
+    for ability_id in ['basic_attack', 'blast', 'drainhp', 'reckless_charge', 'givehp']:
+        ability = gdb['abilities'][ability_id]
+        expected = resolver_damage(attacker, defender, ability)
+        assert np.isclose(table.ability_damage(ability_id)[0], expected)
+
+
+def test_fractional_strength_factor(gdb, monkeypatch):
+    # pylint: disable=protected-access
+    for ability_id in gdb['abilities']:
+        plan = gdb.compiled('abilities', ability_id)
+        monkeypatch.setitem(gdb._compiled['abilities'], ability_id, EffectPlan(
+            step._replace(parameters=types.MappingProxyType(dict(
+                step.parameters,
+                strength_factor=step.parameters['strength_factor'] * 0.35
+            )))
+            if step.type == 'change_stat' else step
+            for step in plan
+        ))
+
+    monsters = make_monsters(2)
+    attacker, defender = monsters[0], monsters[1]
+    table = balance.DamageTable([(i.form, i.weapon, i.abilities) for i in (attacker, defender)])
+    assert table.odds.damage_factor[table.attackers.abilities.index['blast']] == 0.35
+    for ability_id in ['basic_attack', 'blast']:
+        ability = gdb['abilities'][ability_id]
+        damage = table.ability_damage(ability_id)[0]
+        assert np.isclose(damage, resolver_damage(attacker, defender, ability))
+
+    best = table.best_ability[0]
+    hit_points = table.defenders.stat('hp')
+    for col in range(2):
+        expected = expected_turns(
+            int(hit_points[col]),
+            table.odds.hit[best],
+            table.odds.crit[best],
+            table.hit_damage[0, best],
+            table.crit_damage[0, best],
+        )
+        assert np.isclose(table.turns_to_kill[0, col], expected)
+
+
+def test_turns_to_kill(gdb):
+    entries = balance.loadouts(gdb)
+    table = balance.DamageTable(entries)
+    hit_points = table.defenders.stat('hp')
+
+    for row in [0, len(entries) // 2, len(entries) - 1]:
+        best = table.best_ability[row]
+        assert table.usable[row, best]
+        assert table.dps[row] == table.expected_damage[row][table.usable[row]].max()
+
+        p_hit = table.odds.hit[best]
+        p_crit = table.odds.crit[best]
+        hit = table.hit_damage[row, best]
+        crit = table.crit_damage[row, best]
+
+        for col in [0, len(entries) - 1]:
+            expected = expected_turns(int(hit_points[col]), p_hit, p_crit, hit, crit)
+            assert np.isclose(table.turns_to_kill[row, col], expected)
+
+
+def test_loadouts(gdb):
+    entries = balance.loadouts(gdb)
+    pairs = {(form.id, weapon.id) for form, weapon, _ in entries}
+    assert ('mine', 'unarmed') in pairs
+    assert ('mine', 'claws') not in pairs
+    assert all(abilities for _, weapon, abilities in entries if weapon.abilities)
+    assert not any(abilities for _, _, abilities in balance.loadouts(gdb, learn_all=False))
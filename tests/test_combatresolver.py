@@ -0,0 +1,93 @@
+from game import combatresolver
+from game.combatresolver import ArenaState
+
+
+class FakeCombatant:
+    def __init__(self, tile_position):
+        self.tile_position = tile_position
+        self.current_hp = 20
+        self.physical_attack = 3
+        self.magical_attack = 2
+
+
+class FixedRolls:
+    def __init__(self, *rolls):
+        self.rolls = list(rolls)
+
+    def randrange(self, _start, _stop):
+        return self.rolls.pop(0)
+
+
+def test_tiles():
+    assert combatresolver.tile_distance((0, 1), (0, -1)) == 2
+    assert combatresolver.tile_distance((1, 1), (3, 3)) == 4
+    assert combatresolver.tile_get_facing_to((0, 0), (1, 1)) == (1, 0)
+    assert combatresolver.tile_get_facing_to((1, 1), (0, 0)) == (-1, 0)
+    assert combatresolver.tile_get_facing_to((1, 1), (1, 3)) == (0, 1)
+    assert combatresolver.tile_get_facing_to((1, 1), (1, 1)) == (0, 0)
+
+
+def test_find_tile_at_range():
+    combatant = FakeCombatant((0, 3))
+    target = FakeCombatant((0, 2))
+    bystander = FakeCombatant((0, 0))
+    state = ArenaState.from_combatants(10, 10, [combatant, target, bystander])
+
+    assert state.find_tile_at_range(target, combatant, 2) == (0, 1)
+    assert state.find_tile_at_range(target, combatant, 3) == (0, 1)
+
+    state.positions[target] = (0, 1)
+    state.positions[combatant] = (0, 2)
+    del state.positions[bystander]
+    assert state.find_tile_at_range(target, combatant, 3) == (0, 0)
+
+
+def test_resolve_knockback(gdb):
+    combatant = FakeCombatant((0, 3))
+    target = FakeCombatant((0, 2))
+    state = ArenaState.from_combatants(10, 10, [combatant, target])
+    ability = gdb['abilities']['knock']
+
+    events = combatresolver.resolve_ability(
+        combatant, target, ability, state, rng=FixedRolls(0, 98)
+    )
+    assert [type(i).__name__ for i in events] == [
+        'AbilityUsed',
+        'PlayAnimation',
+        'PlayVfx',
+        'StatChange',
+        'Knockback',
+    ]
+    assert events[0].is_hit and not events[0].is_crit
+    assert events[3] == combatresolver.StatChange(target, 'current_hp', -4, True, False, True)
+    assert events[4] == combatresolver.Knockback(target, (0, 2), (0, 0))
+
+    # Resolving does not change any state
+    assert target.current_hp == 20
+    assert target.tile_position == (0, 2)
+    assert state.positions[target] == (0, 2)
+
+    for event in events:
+        combatresolver.apply_event(event, state)
+    assert target.current_hp == 16
+    assert target.tile_position == (0, 0)
+    assert state.positions[target] == (0, 0)
+
+
+def test_resolve_miss(gdb):
+    combatant = FakeCombatant((0, 3))
+    target = FakeCombatant((0, 2))
+    state = ArenaState.from_combatants(10, 10, [combatant, target])
+
+    events = combatresolver.resolve_ability(
+        combatant, target, gdb['abilities']['blast'], state, rng=FixedRolls(75, 98)
+    )
+    assert not events[0].is_hit
+    assert events[-1] == combatresolver.StatChange(target, 'current_hp', 0, False, False, True)
+
+    # Crits multiply the strength
+    events = combatresolver.resolve_ability(
+        combatant, target, gdb['abilities']['drainhp'], state, rng=FixedRolls(0, 0)
+    )
+    assert events[0].strength == 4
+    assert [i.delta for i in events if isinstance(i, combatresolver.StatChange)] == [-4, 4]
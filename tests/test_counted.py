@@ -0,0 +1,43 @@
+import copy
+import pickle
+
+from game.counted import CountedList, CountedSet
+from game.monster import LearnedAbilities
+from game.playerdata import TagSet
+
+
+def test_counts():
+    items = CountedList(['a'])
+    items.append('b')
+    items += ['c']
+    assert items.version == 2
+    assert items == ['a', 'b', 'c']
+
+    tags = CountedSet({'a'})
+    tags.add('b')
+    tags -= {'a'}
+    assert tags.version == 2
+    assert tags == {'b'}
+
+
+def test_pickle():
+    for container in [
+            CountedList(['a']),
+            CountedSet({'a'}),
+            LearnedAbilities(['a']),
+            TagSet({'a'}),
+    ]:
+        container.clear()
+        for copied in [
+                pickle.loads(pickle.dumps(container)),
+                copy.deepcopy(container),
+                copy.copy(container),
+        ]:
+            assert type(copied) is type(container) # pylint: disable=unidiomatic-typecheck
+            assert copied == container
+            assert copied.version == container.version == 1
+
+    abilities = pickle.loads(pickle.dumps(LearnedAbilities(['a'])))
+    assert 'a' in abilities
+    abilities.remove('a')
+    assert 'a' not in abilities
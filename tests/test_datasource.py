@@ -0,0 +1,86 @@
+# pylint: disable=redefined-outer-name
+import pickle
+
+import panda3d.core as p3d
+import pytest
+
+from game import datasource
+from game import gamedb
+
+
+@pytest.fixture
+def directory():
+    return datasource.DataDirectory(gamedb.GameDB.data_dir)
+
+
+@pytest.fixture
+def bundle_path(tmp_path, directory):
+    path = tmp_path / 'data.bundle'
+    datasource.write_bundle(directory, str(path))
+    return path
+
+
+@pytest.fixture
+def bundle(bundle_path):
+    bundle = datasource.DataBundle(str(bundle_path))
+    yield bundle
+    bundle.close()
+
+
+def test_bundle_contents(directory, bundle):
+    assert bundle.schema_keys() == directory.schema_keys()
+    for key in directory.schema_keys():
+        assert bundle.read_schema(key) == directory.read_schema(key)
+        assert bundle.has_category(key) == directory.has_category(key)
+        if not directory.has_category(key):
+            continue
+        assert bundle.filenames(key) == directory.filenames(key)
+        assert bundle.content_hash(key) == directory.content_hash(key)
+        for filename in directory.filenames(key):
+            assert bundle.read(key, filename) == directory.read(key, filename)
+
+def test_bundle_pickle(bundle):
+    copy = pickle.loads(pickle.dumps(bundle))
+    assert copy.filenames('forms') == bundle.filenames('forms')
+    copy.close()
+
+def test_bundle_invalid(tmp_path):
+    path = tmp_path / 'bad.bundle'
+    path.write_bytes(b'x' * 64)
+    with pytest.raises(RuntimeError):
+        datasource.DataBundle(str(path))
+
+def test_gamedb_from_bundle(bundle_path):
+    page = p3d.load_prc_file_data(
+        '',
+        f'mercury-data-bundle {bundle_path}\n'
+        'mercury-gamedb-snapshot false\n'
+    )
+    try:
+        gdb = gamedb.GameDB()
+    finally:
+        p3d.unload_prc_file(page)
+
+    assert isinstance(gdb.source, datasource.DataBundle)
+    assert gdb['forms']['mine'].abilities[0] is gdb['abilities']['burrowing_strike']
+    assert repr(gdb['weapons']) == repr(gamedb.get_instance()['weapons'])
+
+def test_hot_reload_prefers_directory(bundle_path, tmp_path, capsys):
+    page = p3d.load_prc_file_data(
+        '',
+        f'mercury-data-bundle {bundle_path}\n'
+        'mercury-gamedb-snapshot false\n'
+        'mercury-gamedb-hot-reload true\n'
+    )
+    try:
+        gdb = gamedb.GameDB()
+        missing = type('NoDataGameDB', (gamedb.GameDB,), {
+            'data_dir': str(tmp_path / 'missing'),
+        })()
+    finally:
+        p3d.unload_prc_file(page)
+
+    assert isinstance(gdb.source, datasource.DataDirectory)
+    # Without loose files the bundle is used, which cannot be hot-reloaded
+    assert isinstance(missing.source, datasource.DataBundle)
+    assert 'hot-reload will not pick up' in capsys.readouterr().err
@@ -0,0 +1,33 @@
+import panda3d.core as p3d
+
+from game.floatingtext import FloatingTextPool
+
+
+def test_reuse():
+    pool = FloatingTextPool()
+    parent = p3d.NodePath('parent')
+
+    miss = pool.acquire(parent, 'Miss')
+    assert miss.get_parent() == parent
+    geometry = pool.get_geometry('Miss')
+    pool.release(miss)
+    assert not miss.has_parent()
+
+    assert pool.acquire(parent, 'HP: -4') is miss
+    assert miss.get_num_children() == 1
+    assert miss.get_tag('text') == 'HP: -4'
+    other = pool.acquire(parent, 'Miss')
+    assert other is not miss
+    assert pool.get_geometry('Miss') is geometry
+    assert pool.created == 2
+    pool.clear()
+
+
+def test_geometry_cache_limit():
+    pool = FloatingTextPool(max_cached=2)
+    first = pool.get_geometry('HP: -1')
+    pool.get_geometry('HP: -2')
+    assert pool.get_geometry('HP: -1') is first
+    pool.get_geometry('HP: -3')
+    assert pool.get_geometry('HP: -1') is first
+    assert len(pool._geometry) == 2 # pylint: disable=protected-access
@@ -1,3 +1,53 @@
+# pylint: disable=unused-argument,redefined-outer-name
+import concurrent.futures
+import copy
+import json
+import multiprocessing
+import os
+import shutil
+
+import panda3d.core as p3d
+import pytest
+
+from game import gamedb
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    page = p3d.load_prc_file_data('', f'mercury-cache-dir {tmp_path}')
+    yield tmp_path
+    p3d.unload_prc_file(page)
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    datapath = tmp_path / 'data'
+    shutil.copytree(gamedb.GameDB.data_dir, datapath)
+    return datapath
+
+
+def load_gdb(data_dir):
+    gdbcls = type('TestGameDB', (gamedb.GameDB,), {
+        'data_dir': str(data_dir),
+        'schema_dir': str(data_dir / 'schemas'),
+    })
+    gdb = gdbcls()
+    gdb.use_snapshot = False
+    return gdb
+
+
+LOAD_EXECUTORS = {
+    'serial': 'mercury-gamedb-load-workers 0',
+    'process': 'mercury-gamedb-load-workers 2',
+}
+
+@pytest.fixture(params=LOAD_EXECUTORS.keys())
+def load_executor(request):
+    page = p3d.load_prc_file_data('', LOAD_EXECUTORS[request.param])
+    yield request.param
+    p3d.unload_prc_file(page)
+
+
 def test_load(gdb):
     assert gdb
 
@@ -10,3 +60,202 @@ def test_keys(gdb):
 
     for key in gdb_keys:
         assert key in gdb
+
+def test_snapshot_round_trip(cache_dir):
+    cold = gamedb.GameDB()
+    cold_data = repr(dict(cold.items()))
+    for key in cold:
+        assert os.path.exists(cache_dir / gamedb.SNAPSHOT_FILE.format(key))
+
+    warm = gamedb.GameDB()
+    assert repr(dict(warm.items())) == cold_data
+    assert warm['forms']['mine'].abilities[0] is warm['abilities']['burrowing_strike']
+    assert isinstance(warm['weapons']['bow'], warm.schema_to_datamodel['weapons'])
+
+def test_snapshot_rebuild(cache_dir):
+    snappath = cache_dir / gamedb.SNAPSHOT_FILE.format('abilities')
+    snappath.write_bytes(b'garbage')
+    gdb = gamedb.GameDB()
+    assert gdb['abilities']['basic_attack'].name == 'Attack'
+    assert snappath.read_bytes() != b'garbage'
+
+@pytest.mark.parametrize('use_snapshot', [True, False])
+def test_lazy_categories(cache_dir, use_snapshot):
+    gdb = gamedb.GameDB()
+    gdb.use_snapshot = use_snapshot
+    assert 'forms' in gdb
+    assert not gdb.materialized_categories
+
+    assert gdb['abilities']['hp_up']
+    assert gdb.materialized_categories == ('abilities',)
+
+    assert gdb['forms']['mine'].abilities[0] is gdb['abilities']['burrowing_strike']
+    assert set(gdb.materialized_categories) == {'abilities', 'forms'}
+
+def test_load_executors(data_dir, load_executor):
+    gdb = load_gdb(data_dir)
+    assert repr(gdb['forms']) == repr(load_gdb(data_dir)['forms'])
+    assert gdb['forms']['mine'].abilities[0] is gdb['abilities']['burrowing_strike']
+
+def test_spawned_load_worker(data_dir, cache_dir):
+    # Spawned workers only know the source and config they are handed
+    gdb = load_gdb(data_dir)
+    context = multiprocessing.get_context('spawn')
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=1,
+        mp_context=context,
+        initializer=gamedb._init_load_worker, # pylint: disable=protected-access
+        initargs=(
+            gdb.source,
+            gdb.get_schema('forms'),
+            gamedb._load_worker_config(), # pylint: disable=protected-access
+        ),
+    ) as executor:
+        data, error, _ = executor.submit(
+            gamedb._load_worker_file, # pylint: disable=protected-access
+            'forms',
+            'mine.json',
+            False
+        ).result()
+    assert error is None
+    assert data['id'] == 'mine'
+    assert os.listdir(cache_dir / 'validators')
+
+def test_load_errors(data_dir, load_executor):
+    (data_dir / 'abilities' / 'broken.json').write_text('{"name": ')
+    (data_dir / 'abilities' / 'a_invalid.json').write_text('{"name": "Foo"}')
+
+    gdb = load_gdb(data_dir)
+    with pytest.raises(gamedb.GameDBLoadError) as excinfo:
+        gdb['abilities'] # pylint: disable=pointless-statement
+    assert [i[0] for i in excinfo.value.errors] == [
+        os.path.join('abilities', 'a_invalid.json'),
+        os.path.join('abilities', 'broken.json'),
+    ]
+
+def test_frozen_records(gdb):
+    ability = gdb['abilities']['basic_attack']
+    assert not hasattr(ability, '__dict__')
+    with pytest.raises(AttributeError):
+        ability.power = 10
+    with pytest.raises(AttributeError):
+        ability.foo = 10
+    assert isinstance(gdb['forms']['mine'].abilities, tuple)
+
+    form = gdb['forms']['mine']
+    with pytest.raises(TypeError):
+        form.mesh['bam_file'] = 'foo.bam'
+    with pytest.raises(TypeError):
+        form.weapon_offset['scale'][0] = 2
+    with pytest.raises(TypeError):
+        gdb['abilities']['drainhp'].effects[1]['parameters']['strength_factor'] = 2
+    assert isinstance(form.to_dict()['mesh'], dict)
+    assert form.to_dict()['weapon_offset']['scale'] == [1, 1, 1]
+
+def test_mutable_records(gdb):
+    monster = gdb.schema_to_datamodel['monsters']({
+        'id': 'foo',
+        'name': 'Foo',
+        'form': 'mine',
+    })
+    monster.link(gdb)
+    monster.power_available = 2
+    assert monster.to_dict()['power_available'] == 2
+    assert monster.to_dict()['form'] == 'mine'
+
+def test_indexes(gdb):
+    weapons = gdb.sorted_values('weapons')
+    assert [i.name for i in weapons] == sorted(i.name for i in gdb['weapons'].values())
+
+    assert gdb['forms']['dragon'] in gdb.with_tag('forms', 'dragon')
+    assert gdb.with_required_tag('weapons', 'dragon') == (gdb['weapons']['claws'],)
+    assert gdb['abilities']['hp_up'] in gdb.of_type('abilities', 'none')
+    assert gdb.with_tag('forms', 'missing_tag') == ()
+
+    eligible = gdb.eligible('forms', {'rank_0', 'rank_1'})
+    assert gdb['forms']['mine'] in eligible
+    assert gdb['forms']['armor'] not in eligible
+    assert gdb.eligible('forms', {'rank_1', 'rank_0'}) is eligible
+
+    excluding = gdb.excluding_required_tags('forms', {'in_test'})
+    assert gdb['forms']['bobcatshark'] not in excluding
+    assert gdb['forms']['armor'] in excluding
+
+    referrers = gdb.referrers('abilities', 'pa_up')
+    assert gdb['forms']['mine'] in referrers['forms']
+    assert gdb['weapons']['sword'] in referrers['weapons']
+    assert gdb['forms']['tomb'] not in referrers['forms']
+
+
+def test_tag_masks(gdb):
+    claws = gdb['weapons']['claws']
+    assert claws.required_tag_mask == gdb.tag_mask(['dragon'])
+    assert gdb.tag_names(claws.required_tag_mask) == {'dragon'}
+    assert gdb.tag_mask({'dragon', 'in_test'}) == gdb.tag_mask(['in_test', 'dragon'])
+
+    mask = gdb.tag_mask(['dragon'])
+    assert gdb.eligible('weapons', mask) == gdb.eligible('weapons', {'dragon'})
+    assert claws in gdb.eligible('weapons', mask)
+    assert claws not in gdb.eligible('weapons', 0)
+
+
+def test_hot_reload(data_dir):
+    gdb = load_gdb(data_dir)
+    ability = gdb['abilities']['multi_shot']
+    bow = gdb['weapons']['bow']
+    assert gdb.reload_changed() == []
+
+    abilities_dir = data_dir / 'abilities'
+    (abilities_dir / 'multi_shot.json').write_text(
+        '{"name": "Many Shots", "power": 3, "type": "physical"}'
+    )
+    (abilities_dir / 'new_shot.json').write_text(
+        '{"name": "New Shot", "power": 1, "type": "physical"}'
+    )
+    generation = gdb.generation
+    assert sorted(gdb.reload_changed()) == [
+        ('abilities', 'multi_shot'),
+        ('abilities', 'new_shot'),
+    ]
+    assert gdb.generation > generation
+    assert gdb['abilities']['multi_shot'] is ability
+    assert ability.name == 'Many Shots'
+    assert bow.abilities[0] is ability
+    assert gdb['abilities']['new_shot'] in gdb.of_type('abilities', 'physical')
+
+    (data_dir / 'weapons' / 'bow.json').write_text(
+        '{"name": "Bow", "damage": 1, "abilities": ["new_shot"]}'
+    )
+    assert gdb.reload_changed() == [('weapons', 'bow')]
+    assert gdb['weapons']['bow'] is bow
+    assert bow.abilities == (gdb['abilities']['new_shot'],)
+    assert gdb.referrers('abilities', 'new_shot')['weapons'] == (bow,)
+
+    (abilities_dir / 'new_shot.json').unlink()
+    assert gdb.reload_changed() == [('abilities', 'new_shot')]
+    assert 'new_shot' not in gdb['abilities']
+
+def test_hot_reload_invalid(data_dir, capsys):
+    gdb = load_gdb(data_dir)
+    ability = gdb['abilities']['multi_shot']
+    (data_dir / 'abilities' / 'multi_shot.json').write_text('{"name": ')
+    assert gdb.reload_changed() == []
+    assert gdb['abilities']['multi_shot'] is ability
+    assert 'multi_shot.json' in capsys.readouterr().err
+
+
+def test_nested_defaults(gdb):
+    assert gdb['weapons']['unarmed'].mesh['root_node'] == ''
+    assert gdb['forms']['mine'].weapon_offset['scale'] == (1, 1, 1)
+
+    # A single validation pass fills in everything a repeated pass would
+    for key in gdb:
+        data_model = gdb.schema_to_datamodel[key]
+        for filename in sorted(os.listdir(os.path.join(gdb.data_dir, key))):
+            with open(os.path.join(gdb.data_dir, key, filename), encoding='utf8') as datafile:
+                data = json.load(datafile)
+            data.setdefault('id', filename.rsplit('.', 1)[0])
+            data_model.validate(data)
+            once = copy.deepcopy(data)
+            data_model.validate(data)
+            assert data == once, f'{key}/{filename}'
@@ -0,0 +1,89 @@
+# pylint: disable=unused-argument,redefined-outer-name
+import json
+import time
+import tracemalloc
+
+import panda3d.core as p3d
+import pytest
+
+from game import gamedb
+from game import loadprofile
+
+
+@pytest.fixture
+def profiled(tmp_path):
+    page = p3d.load_prc_file_data('', '\n'.join([
+        'mercury-gamedb-profile json',
+        'mercury-gamedb-profile-allocations true',
+        f'mercury-cache-dir {tmp_path}',
+    ]))
+    yield
+    p3d.unload_prc_file(page)
+
+
+def test_disabled():
+    profile = loadprofile.LoadProfile()
+    with profile.measure('linking', 'forms'):
+        pass
+    profile.add('file_read', 'forms', 'mine.json', 1.0)
+    assert not profile.entries
+
+
+def test_totals():
+    profile = loadprofile.LoadProfile(enabled=True)
+    profile.add('validation', 'forms', 'a.json', 0.5, 10)
+    profile.add('file_read', 'forms', 'a.json', 0.25, 20)
+    profile.add('file_read', 'forms', 'b.json', 0.25, 5)
+
+    assert profile.totals() == [
+        (('forms', None, 'file_read'), [2, 0.5, 25]),
+        (('forms', None, 'validation'), [1, 0.5, 10]),
+    ]
+    assert len(profile.totals(by_file=True)) == 3
+
+    report = json.loads(profile.report('json'))
+    assert report['total_seconds'] == 1.0
+    assert {i['file'] for i in report['files']} == {'a.json', 'b.json'}
+    assert 'validation' in profile.report('table')
+    with pytest.raises(RuntimeError):
+        profile.report('xml')
+
+
+def test_exclusive_time():
+    profile = loadprofile.LoadProfile(enabled=True)
+    with profile.measure('linking', 'forms'):
+        with profile.measure('file_read', 'abilities'):
+            time.sleep(0.05)
+        with profile.exclude():
+            time.sleep(0.05)
+            profile.add('validation', 'abilities', 'a.json', 0.5)
+
+    seconds = {phase: seconds for phase, _, _, seconds, _ in profile.entries}
+    assert seconds['file_read'] >= 0.05
+    assert seconds['linking'] < 0.05
+    assert seconds['validation'] == 0.5
+
+
+def test_gamedb_profile(profiled):
+    was_tracing = tracemalloc.is_tracing()
+    gdb = gamedb.GameDB()
+    assert gdb.profile_format == 'json'
+    assert tracemalloc.is_tracing()
+    _ = gdb['forms']
+
+    report = json.loads(gdb.load_profile.report(gdb.profile_format))
+    # Tracing is only left on if something else turned it on
+    assert tracemalloc.is_tracing() == was_tracing
+    phases = {
+        i['phase']
+        for i in report['categories']
+        if i['category'] == 'forms'
+    }
+    for phase in ['schema_load', 'file_read', 'json_parse', 'validation', 'linking', 'indexing']:
+        assert phase in phases
+    files = {
+        i['file']
+        for i in report['files']
+        if i['category'] == 'forms'
+    }
+    assert files == set(gdb.source.filenames('forms'))
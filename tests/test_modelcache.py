@@ -0,0 +1,80 @@
+import panda3d.core as p3d
+
+from game import modelcache
+
+
+def make_cache(budget):
+    loaded = []
+    released = []
+    def load(key):
+        loaded.append(key)
+        return key
+    cache = modelcache.ModelCache(
+        load,
+        budget=budget,
+        size_fn=len,
+        release_fn=released.append
+    )
+    return cache, loaded, released
+
+
+def test_hits():
+    cache, loaded, _ = make_cache(100)
+    assert cache.get('aaa') == 'aaa'
+    assert cache.get('aaa') == 'aaa'
+    assert loaded == ['aaa']
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.size == 3
+
+
+def test_lru_eviction():
+    cache, loaded, released = make_cache(6)
+    cache.get('aaa')
+    cache.get('bbb')
+    cache.get('aaa')
+    cache.get('ccc')
+    assert released == ['bbb']
+    assert 'aaa' in cache and 'ccc' in cache
+    assert cache.size == 6
+
+    # A single model over budget is kept until something replaces it
+    cache.get('dddddddd')
+    assert len(cache) == 1
+    assert released == ['bbb', 'aaa', 'ccc']
+
+    cache.clear()
+    assert cache.size == 0
+    assert loaded == ['aaa', 'bbb', 'ccc', 'dddddddd']
+
+
+def test_estimate_size():
+    cardmaker = p3d.CardMaker('card')
+    card = p3d.NodePath(cardmaker.generate())
+    assert modelcache.estimate_size(card) > 0
+    assert modelcache.estimate_size(p3d.NodePath('empty')) == 0
+
+
+def test_request_async():
+    pending = []
+    cache = modelcache.ModelCache(
+        lambda key: key,
+        budget=100,
+        size_fn=len,
+        load_async_fn=lambda key, callback: pending.append((key, callback))
+    )
+    results = []
+    cache.request('aaa', results.append)
+    cache.request('aaa', results.append)
+    assert cache.is_pending('aaa')
+    assert len(pending) == 1
+    assert not results
+
+    key, callback = pending.pop()
+    callback(key)
+    assert results == ['aaa', 'aaa']
+    assert 'aaa' in cache and not cache.is_pending('aaa')
+
+    # Cached models are handed out immediately
+    cache.request('aaa', results.append)
+    assert len(results) == 3
+    assert not pending
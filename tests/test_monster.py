@@ -1,10 +1,21 @@
 # pylint: disable=protected-access
+import builtins
+import random
 
-from game.monster import Monster
+from game.monster import AnimTable, Monster, MonsterActor
 
 def test_tags(monster):
     assert 'form_bobcatshark' in monster.tags
 
+def test_can_use_weapon(monster, gdb):
+    claws = gdb['weapons']['claws']
+    assert not monster.can_use_weapon(claws)
+    assert monster.can_use_weapon(claws, {'dragon'})
+
+    monster.form = gdb['forms']['dragon']
+    assert 'form_dragon' in monster.tags
+    assert monster.can_use_weapon(claws)
+
 def test_passive_upgrade(monster):
     prevhp = monster.hit_points
     monster.abilities_learned_form.append('hp_up')
@@ -13,3 +24,129 @@ def test_passive_upgrade(monster):
 def test_gen_random():
     mon = Monster.gen_random('test', 1)
     assert mon
+
+def test_stat_cache(monster):
+    prevhp = monster.hit_points
+    breakdown = monster.stat_breakdown('hp')
+    assert breakdown.base == monster.form.hp
+    assert breakdown.form == monster.form.id
+    assert breakdown.total == prevhp
+    assert monster.stat_breakdown('hp') is breakdown
+
+    monster.abilities_learned_form.append('hp_up')
+    breakdown = monster.stat_breakdown('hp')
+    assert 'hp_up' in breakdown.upgrades
+    assert breakdown.total == monster.hit_points > prevhp
+
+    monster.abilities_learned_form.remove('hp_up')
+    assert monster.hit_points == prevhp
+
+    monster.abilities_learned_form = ['hp_up']
+    assert monster.hit_points > prevhp
+
+    monster.power_available += 1
+    assert monster.stat_breakdown('hp') is not breakdown
+
+def test_stat_cache_swap(gdb):
+    monster = Monster.make_new('id', 'test', 'mine')
+    assert monster.hit_points == gdb['forms']['mine'].hp
+
+    dragon = gdb['forms']['dragon']
+    monster.form = dragon
+    assert monster.hit_points == dragon.hp
+    breakdown = monster.stat_breakdown('hp')
+    assert breakdown.form == 'dragon'
+    assert breakdown.base == dragon.hp
+
+    monster.abilities_learned_weapon = ['pa_up']
+    monster.weapon = 'claws'
+    assert monster.weapon.id == 'claws'
+    assert monster.stat_breakdown('hp') is not breakdown
+    assert not monster.stat_breakdown('physical_attack').upgrades
+
+def test_learned_abilities(monster):
+    assert monster.abilities == ()
+    monster.abilities_learned_form.append('hp_up')
+    abilities = monster.abilities
+    assert [i.id for i in abilities] == ['hp_up']
+    assert monster.abilities is abilities
+    assert 'hp_up' in monster.abilities_learned_form
+
+    data = monster.to_dict(skip_extras=True)
+    assert type(data['abilities_learned_form']) is list # pylint: disable=unidiomatic-typecheck
+    assert data['abilities_learned_form'] == ['hp_up']
+
+    monster.weapon = 'unarmed'
+    assert monster.abilities is not abilities
+
+def test_gen_random_batch():
+    def gen_batch(seed, level):
+        return Monster.gen_random_batch(
+            [f'test{i}' for i in range(20)],
+            level,
+            random.Random(seed)
+        )
+
+    monsters = gen_batch(1, 1)
+    assert [i.id for i in monsters] == [f'test{i}' for i in range(20)]
+    assert [i.to_dict() for i in monsters] == [i.to_dict() for i in gen_batch(1, 1)]
+
+    for monster in monsters:
+        assert not monster.form.required_tags
+        assert monster.can_use_weapon(monster.weapon, {'rank_0', 'rank_1'})
+        assert monster.power_spent <= monster.power_available == 1
+
+    high_level = gen_batch(1, 3)
+    assert max(i.power_available for i in high_level) == 3
+    assert any(i.form.required_tags for i in high_level)
+
+def test_anim_table(gdb, capsys):
+    form = gdb['forms']['mine']
+    table = AnimTable(form, ['cg.Idle', 'cg.Attack', 'burrowing_strike'], ['idle', 'attack', 'hit'])
+    assert table.resolve('idle') == 'cg.Idle'
+    assert table.resolve('cg.Attack') == 'cg.Attack'
+    assert table.resolve(('burrowing_strike', 'attack')) == 'burrowing_strike'
+    assert table.resolve(('unknown', 'attack')) == 'cg.Attack'
+    assert table.resolve(('unknown',)) is None
+
+    assert {'hit', 'death', 'magic', 'walk'} <= table.missing
+    assert 'idle' not in table.missing
+    assert 'missing an animation: hit' in capsys.readouterr().out
+
+def test_unload_unused_anims(gdb, monkeypatch):
+    monkeypatch.delattr(builtins, 'base', raising=False)
+    actor = MonsterActor(gdb['forms']['mine'])
+    monkeypatch.setattr(actor._path, 'get_current_anim', lambda: 'cg.Idle')
+    actor._anim_last_used.update({
+        'cg.Idle': 0,
+        'cg.Walk': 0,
+        'cg.Attack': float('inf'),
+    })
+
+    assert actor.unload_unused_anims(max_age=10) == ['cg.Walk']
+    assert set(actor._anim_last_used) == {'cg.Idle', 'cg.Attack'}
+
+def test_anim_table_cache(gdb, monkeypatch, capsys):
+    monkeypatch.delattr(builtins, 'base', raising=False)
+    monkeypatch.setattr(MonsterActor, '_anim_tables', {})
+    monkeypatch.setattr(MonsterActor, '_anim_tables_generation', None)
+    monkeypatch.setattr(MonsterActor, '_ANIMS', None)
+    actor = MonsterActor(gdb['forms']['mine'])
+    other = MonsterActor(gdb['forms']['mine'])
+    other._model_key = ('placeholder.bam', 'root')
+
+    # Headless actors have no animation library, so nothing is cached or
+    # reported missing
+    assert actor.anim_table.resolve('cg.Idle') is None
+    assert not MonsterActor._anim_tables
+    assert 'Warning' not in capsys.readouterr().out
+
+    monkeypatch.setattr(MonsterActor, '_ANIMS', {'cg.Idle': None, 'cg.Attack': None})
+    table = actor.anim_table
+    assert table.resolve('cg.Idle') == 'cg.Idle'
+    assert other.anim_table is table
+
+    # Tables from older data generations are dropped
+    monkeypatch.setattr(gdb, 'generation', gdb.generation + 1)
+    assert actor.anim_table is not table
+    assert list(MonsterActor._anim_tables) == [('mine', gdb.generation)]
@@ -29,6 +29,9 @@ def test_tags(player):
     player.personal_tags.remove('in_test')
     assert not player.can_use_form(player.monsters[0].form)
 
+    player.personal_tags = ['in_test']
+    assert player.can_use_form(player.monsters[0].form)
+
 def test_max_monsters(player):
     '''Increasing rank should allow for more golems'''
 
@@ -0,0 +1,46 @@
+import random
+
+from game import effects
+from game import rostertable
+from game.monster import Monster
+
+
+def random_roster(count):
+    rng = random.Random(1234)
+    monsters = []
+    for idx in range(count):
+        monster = Monster.gen_random(f'roster{idx}', 1)
+        monster.abilities_learned_form = [
+            i.id for i in monster.form.abilities if rng.random() < 0.5
+        ]
+        monster.abilities_learned_weapon = [
+            i.id for i in monster.weapon.abilities if rng.random() < 0.5
+        ]
+        monsters.append(monster)
+    return monsters
+
+
+def test_matches_monster(gdb):
+    monsters = random_roster(50)
+    table = rostertable.RosterTable.from_monsters(monsters)
+    assert len(table) == len(monsters)
+
+    for row, monster in enumerate(monsters):
+        for stat in Monster.BASE_STATS:
+            assert table.stat(stat)[row] == getattr(monster, stat)
+            assert table.upgrades_for_stat(stat)[row] == monster.upgrades_for_stat(stat)
+        for ability in gdb['abilities'].values():
+            strength = effects.calculate_strength(monster, ability)
+            assert table.ability_strength(ability.id)[row] == strength
+
+
+def test_entries(gdb):
+    form = gdb['forms']['mine']
+    weapon = gdb['weapons']['unarmed']
+    hp_up = gdb['abilities']['hp_up']
+    table = rostertable.RosterTable([
+        (form, weapon, ()),
+        (form, weapon, (hp_up,)),
+    ])
+    assert table.stat('hit_points')[0] == form.hp
+    assert table.stat('hit_points')[1] > form.hp
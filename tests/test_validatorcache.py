@@ -0,0 +1,56 @@
+# pylint: disable=redefined-outer-name,protected-access
+import os
+
+import fastjsonschema
+import panda3d.core as p3d
+import pytest
+
+from game import gamedb
+from game import validatorcache
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    page = p3d.load_prc_file_data('', f'mercury-cache-dir {tmp_path}')
+    validatorcache._VALIDATORS.clear()
+    yield tmp_path
+    validatorcache._VALIDATORS.clear()
+    p3d.unload_prc_file(page)
+
+
+@pytest.fixture
+def schema():
+    return gamedb.load_schema(os.path.join(
+        gamedb.GameDB.schema_dir,
+        f'abilities{gamedb.GameDB.schema_suffix}'
+    ))
+
+
+def test_cached_module(cache_dir, schema):
+    validate = validatorcache.get_validator(schema)
+    modname = validatorcache.module_name(schema)
+    modpath = cache_dir / validatorcache.CACHE_SUBDIR / f'{modname}.py'
+    assert modpath.exists()
+
+    data = validate({'id': 'foo', 'name': 'Foo', 'power': 1, 'type': 'none'})
+    assert data['hit_chance'] == 100
+    with pytest.raises(fastjsonschema.exceptions.JsonSchemaException):
+        validate({'id': 'foo'})
+
+    # A fresh process imports the cached module instead of regenerating it
+    validatorcache._VALIDATORS.clear()
+    mtime = modpath.stat().st_mtime_ns
+    assert validatorcache.get_validator(schema).__module__.endswith(modname)
+    assert modpath.stat().st_mtime_ns == mtime
+
+
+def test_schema_hash(schema):
+    modname = validatorcache.module_name(schema)
+    schema['properties']['power']['default'] = 0
+    assert validatorcache.module_name(schema) != modname
+
+
+def test_write_package(tmp_path, schema):
+    validatorcache.write_package([schema], tmp_path)
+    assert (tmp_path / '__init__.py').exists()
+    assert (tmp_path / f'{validatorcache.module_name(schema)}.py').exists()
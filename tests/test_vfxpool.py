@@ -0,0 +1,63 @@
+import os
+
+import panda3d.core as p3d
+from direct.particles import ParticleEffect as particleeffect
+
+from game.vfxpool import VfxPool
+
+
+VFXDIR = os.path.join(os.path.dirname(__file__), '..', 'assets', 'vfx')
+
+
+def make_pool(max_particles):
+    return VfxPool(max_particles, path_fn=lambda name: os.path.join(VFXDIR, f'{name}.ptf'))
+
+
+def test_reuse():
+    pool = make_pool(1000)
+    sparks = pool.acquire('sparks')
+    assert sparks.particle_count == 100
+    assert pool.live_particles == 100
+    config = pool.get_config('sparks')
+
+    pool.release(sparks)
+    assert pool.live_particles == 0
+    assert pool.acquire('sparks') is sparks
+    assert pool.get_config('sparks') is config
+    assert pool.acquire('sparks') is not sparks
+    pool.clear()
+
+
+def test_particle_cap():
+    pool = make_pool(250)
+    first = pool.acquire('sparks')
+    second = pool.acquire('sparks')
+    assert pool.acquire('sparks') is None
+    assert pool.skipped == 1
+    assert pool.live_particles == 200
+
+    pool.release(first)
+    assert pool.acquire('sparks') is first
+    pool.release(first)
+    pool.release(second)
+    assert pool.live_particles == 0
+    pool.clear()
+
+
+def test_abandoned_interval(monkeypatch):
+    monkeypatch.setattr(particleeffect.ParticleEffect, 'start', lambda self, parent: None)
+    pool = make_pool(1000)
+    parent = p3d.NodePath('parent')
+
+    sequence = pool.interval('sparks', parent, 1.0)
+    sequence.set_t(0.5)
+    assert pool.live_particles == 100
+
+    # The sequence never reaches the end, so the effect is only returned
+    # by release_all()
+    pool.release_all()
+    assert pool.live_particles == 0
+    sequence.finish()
+    assert pool.live_particles == 0
+    assert pool.acquire('sparks') is not None
+    pool.clear()